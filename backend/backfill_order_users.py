@@ -0,0 +1,112 @@
+"""
+Backfill user_id on orders placed before orders were linked to accounts.
+
+An order is linked only when its customer_email or customer_phone identifies
+exactly one user, and the two do not point at different users. Names are never
+used: a guest who shares a registered user's name is not that user. Orders
+that match nobody, or more than one user, get user_id = None so they are not
+attributed to the wrong account.
+
+Progress is checkpointed in the meta collection after every batch, so the job
+can be stopped at any time and simply run again to continue.
+
+    python backfill_order_users.py [--batch-size 500] [--restart]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from repositories import Database
+
+CHECKPOINT_ID = "backfill_order_user_id"
+
+
+class UserMatcher:
+    # Memoises lookups; a handful of customers account for most orders
+    def __init__(self, db: Database):
+        self.db = db
+        self._memo: Dict[Tuple[str, str], Optional[str]] = {}
+
+    async def _unique(self, field: str, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        key = (field, value)
+        if key not in self._memo:
+            users = await self.db.users.collection.find({field: value}, {"_id": 0, "id": 1}).to_list(length=2)
+            self._memo[key] = users[0]["id"] if len(users) == 1 else None
+        return self._memo[key]
+
+    async def match(self, order: dict) -> Optional[str]:
+        by_email = await self._unique("email", order.get("customer_email"))
+        by_phone = await self._unique("phone", order.get("customer_phone"))
+        if by_email and by_phone and by_email != by_phone:
+            return None
+        return by_email or by_phone
+
+
+async def backfill(db: Database, batch_size: int = 500, restart: bool = False) -> Tuple[int, int]:
+    meta = db.database.meta
+    orders = db.orders.collection
+    if restart:
+        await meta.delete_one({"_id": CHECKPOINT_ID})
+
+    checkpoint = await meta.find_one({"_id": CHECKPOINT_ID}) or {}
+    last_id = checkpoint.get("last_id")
+    scanned, linked = checkpoint.get("scanned", 0), checkpoint.get("linked", 0)
+    matcher = UserMatcher(db)
+
+    while True:
+        query = {"user_id": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await orders.find(
+            query, {"_id": 1, "customer_email": 1, "customer_phone": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        updates = []
+        for order in batch:
+            user_id = await matcher.match(order)
+            linked += user_id is not None
+            # $exists guard: never overwrite a user_id set by a live checkout
+            updates.append(UpdateOne({"_id": order["_id"], "user_id": {"$exists": False}},
+                                     {"$set": {"user_id": user_id}}))
+        await orders.bulk_write(updates, ordered=False)
+
+        last_id = batch[-1]["_id"]
+        scanned += len(batch)
+        await meta.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"last_id": last_id, "scanned": scanned, "linked": linked,
+                      "updated_at": datetime.now().isoformat()}},
+            upsert=True,
+        )
+        print(f"   {scanned} orders scanned, {linked} linked")
+
+    return scanned, linked
+
+
+async def _main(batch_size: int, restart: bool) -> int:
+    db = Database(AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017')))
+    try:
+        scanned, linked = await backfill(db, batch_size, restart)
+    finally:
+        db.close()
+    print(f"✅ Backfill complete: {scanned} orders scanned, {linked} linked to a user")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Link existing orders to user accounts")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.batch_size, args.restart)))
@@ -0,0 +1,76 @@
+"""
+Microbenchmark: CPU spent turning a catalog payload into response bytes.
+
+Compares, per request, the old path (jsonable_encoder + json.dumps, what
+FastAPI's default JSONResponse does), the ORJSONResponse path used for every
+non-catalog route, and the pre-encoded bytes the catalog routes now serve.
+No server or database needed.
+
+    python bench_serialization.py [--games 40] [--iterations 2000]
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+
+def sample_catalog(games: int) -> dict:
+    now = datetime.now().isoformat()
+    return {"games": [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Game {n}",
+            "name_ar": f"لعبة رقم {n} - شحن فوري",
+            "description": "Top up your account instantly with secure payment",
+            "description_ar": "اشحن حسابك فوراً مع دفع آمن وتوصيل سريع خلال دقائق",
+            "image_url": f"https://images.unsplash.com/photo-{n:013d}?crop=entropy&cs=srgb&fm=jpg&q=85",
+            "prices": [
+                {"amount": f"{q} عملة", "quantity": q, "price": float(q // 14), "currency": "ريال"}
+                for q in (70, 350, 700, 1400, 3500, 7000)
+            ],
+            "is_active": True,
+            "created_at": now,
+        }
+        for n in range(games)
+    ]}
+
+
+def measure(label: str, fn, iterations: int, baseline: float = None) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    speedup = f"  ({baseline / per_call:.1f}x faster)" if baseline else ""
+    print(f"{label:<40} {per_call:>9.1f} µs/request{speedup}")
+    return per_call
+
+
+def main(games: int, iterations: int):
+    payload = sample_catalog(games)
+    cached = orjson.dumps(payload)
+    print(f"Catalog: {games} games, {len(cached) / 1024:.1f} KiB encoded, {iterations} iterations\n")
+
+    baseline = measure("jsonable_encoder + JSONResponse",
+                       lambda: JSONResponse(jsonable_encoder(payload)), iterations)
+    measure("jsonable_encoder + ORJSONResponse",
+            lambda: ORJSONResponse(jsonable_encoder(payload)), iterations, baseline)
+    measure("orjson.dumps only", lambda: orjson.dumps(payload), iterations, baseline)
+    measure("pre-encoded bytes (catalog routes)",
+            lambda: Response(content=cached, media_type="application/json"), iterations, baseline)
+
+    assert json.loads(cached) == json.loads(JSONResponse(jsonable_encoder(payload)).body)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON serialization paths for catalog responses")
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.games, args.iterations)
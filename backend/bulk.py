@@ -0,0 +1,127 @@
+"""
+Batched admin writes for catalog entities.
+
+A batch is a list of create / update / delete operations that runs as a
+single bulk_write. Updates and deletes of ids that do not exist (or that an
+earlier operation in the same batch deleted) are reported as not_found, and
+ones whose expected version is stale as conflict; neither is written.
+Results come back per operation, in request order.
+
+Existence and versions are read before the batch runs. A concurrent write
+that lands in between makes the filtered update or delete match nothing,
+which bulk_write does not report as an error. When the match counts come up
+short, the touched documents are read back and those operations are
+reported as not_found / conflict instead of done.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Generic, List, Literal, Optional, TypeVar
+
+from pydantic import BaseModel, Field, model_validator
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from repositories import Repository, version_filter
+
+BULK_MAX_OPERATIONS = 500
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class BulkOperation(BaseModel, Generic[T]):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None
+    data: Optional[T] = None
+    # Optimistic concurrency: only apply if the document is still at this version
+    version: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op != "create" and not self.id:
+            raise ValueError(f"{self.op} needs an id")
+        if self.op != "delete" and self.data is None:
+            raise ValueError(f"{self.op} needs data")
+        return self
+
+
+class BulkRequest(BaseModel, Generic[T]):
+    operations: List[BulkOperation[T]] = Field(min_length=1, max_length=BULK_MAX_OPERATIONS)
+    # Ordered batches stop at the first failed write; unordered ones try every operation
+    ordered: bool = True
+
+
+async def apply_bulk(repo: Repository, operations: List[BulkOperation], ordered: bool = True) -> List[dict]:
+    now = datetime.now().isoformat()
+    existing = await repo.versions(op.id for op in operations if op.op != "create")
+
+    results, writes, write_index = [], [], []  # write_index: bulk op index -> result index
+    for index, operation in enumerate(operations):
+        result = {"index": index, "op": operation.op, "id": operation.id}
+        results.append(result)
+        if operation.op == "create":
+            document = {**operation.data.dict(), "id": str(uuid.uuid4()), "version": 1, "created_at": now}
+            result["id"] = document["id"]
+            write = InsertOne(document)
+        elif operation.id not in existing:
+            result["status"] = "not_found"
+            continue
+        elif operation.version is not None and operation.version != existing[operation.id]:
+            result["status"] = "conflict"
+            result["version"] = existing[operation.id]
+            continue
+        elif operation.op == "update":
+            write = UpdateOne({"id": operation.id, **version_filter(operation.version)},
+                              {"$set": {**operation.data.dict(), "updated_at": now}, "$inc": {"version": 1}})
+            existing[operation.id] += 1
+            result["version"] = existing[operation.id]
+        else:
+            del existing[operation.id]
+            write = DeleteOne({"id": operation.id, **version_filter(operation.version)})
+        writes.append(write)
+        write_index.append(index)
+
+    errors, counts = await repo.bulk_write(writes, ordered=ordered) if writes else ({}, {})
+    first_error = min(errors, default=None)
+    done = {"create": "created", "update": "updated", "delete": "deleted"}
+    for position, index in enumerate(write_index):
+        result = results[index]
+        if position in errors:
+            result["status"] = "error"
+            result["error"] = errors[position].get("errmsg", "write failed")
+        elif ordered and first_error is not None and position > first_error:
+            result["status"] = "skipped"
+        else:
+            result["status"] = done[result["op"]]
+
+    updated = [result for result in results if result.get("status") == "updated"]
+    deleted = [result for result in results if result.get("status") == "deleted"]
+    if len(updated) != counts.get("matched", 0) or len(deleted) != counts.get("deleted", 0):
+        await _recheck(repo, operations, updated + deleted, existing, now)
+    return results
+
+
+async def _recheck(repo: Repository, operations: List[BulkOperation], results: List[dict],
+                   versions: dict, now: str):
+    # Some update or delete matched nothing: find out which from the documents'
+    # current state. A versioned update only counts as applied if the document
+    # still carries this batch's version and timestamp; one that was applied and
+    # then overwritten straight away is reported as a conflict too.
+    cursor = repo.collection.find({"id": {"$in": list({result["id"] for result in results})}},
+                                  {"_id": 0, "id": 1, "version": 1, "updated_at": 1})
+    current = {doc["id"]: doc async for doc in cursor}
+    deleted_here = {result["id"] for result in results if result["op"] == "delete"}
+    for result in results:
+        operation = operations[result["index"]]
+        doc = current.get(result["id"])
+        if result["op"] == "delete":
+            if doc is not None:
+                result["status"] = "conflict"
+                result["version"] = doc.get("version") or 0
+        elif doc is None:
+            if result["id"] not in deleted_here:
+                result["status"] = "not_found"
+                result.pop("version", None)
+        elif operation.version is not None and not (
+                doc.get("version") == versions.get(result["id"]) and doc.get("updated_at") == now):
+            result["status"] = "conflict"
+            result["version"] = doc.get("version") or 0
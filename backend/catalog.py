@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+from compression import EncodedBody
+from repositories import Database
+from search import SearchIndex
+
+CATALOG_ENTITIES = ("games", "news", "banners")
+
+# Safety net only: admin writes invalidate explicitly, the TTL bounds staleness
+# for changes made outside this process (another worker, a mongo shell, ...).
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', '60'))
+
+
+class CatalogEntry(NamedTuple):
+    items: List[dict]
+    by_id: Dict[str, dict]
+    expires_at: float
+    version: int
+    etag: str
+    body: EncodedBody          # {entity: items}, JSON-encoded once per version
+    bodies_by_id: Dict[str, EncodedBody]
+
+
+# In-process cache of the active storefront catalog (games, news, banners).
+#
+# Each entity carries a generation counter that invalidate() bumps. A rebuild
+# only publishes its snapshot if the generation did not move while it was
+# reading from Mongo, so a read that raced a delete can never repopulate the
+# cache with the deleted document once the delete has returned.
+#
+# Every published snapshot is stamped with a catalog version. Its ETag is
+# derived from the encoded body (see EncodedBody), not from the version, so
+# workers agree on it and a restart does not invalidate every client's copy.
+#
+# Snapshots also hold their JSON-encoded response bodies, so catalog routes
+# serve cached bytes and encoding (and compression, see compression.py)
+# happens once per version, not per request.
+class CatalogCache:
+    def __init__(self, db: Database, ttl: float = CATALOG_CACHE_TTL):
+        self.db = db
+        self.ttl = ttl
+        self.version = 0
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._generations = dict.fromkeys(CATALOG_ENTITIES, 0)
+        self._locks = {entity: asyncio.Lock() for entity in CATALOG_ENTITIES}
+        self._storefront = None  # (entries it was built from, body, etag)
+        self._price_index = None  # (games entry it was built from, index)
+        self._search = SearchIndex()
+        self._search_entry: Optional[CatalogEntry] = None  # games entry the index matches
+
+    def _fresh(self, entity: str) -> Optional[CatalogEntry]:
+        entry = self._entries.get(entity)
+        if entry and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    async def load(self, entity: str) -> CatalogEntry:
+        entry = self._fresh(entity)
+        if entry:
+            return entry
+
+        async with self._locks[entity]:
+            entry = self._fresh(entity)
+            if entry:
+                return entry
+
+            generation = self._generations[entity]
+            items = await getattr(self.db, entity).find_active()
+
+            # A TTL refresh that finds the same documents keeps its version and
+            # encoded bodies; anything else gets a new version.
+            previous = self._entries.get(entity)
+            if previous and previous.items == items:
+                version, body, bodies_by_id = previous.version, previous.body, previous.bodies_by_id
+            else:
+                self.version += 1
+                version = self.version
+                body = EncodedBody(orjson.dumps({entity: items}))
+                bodies_by_id = {item["id"]: EncodedBody(orjson.dumps(item)) for item in items}
+
+            entry = CatalogEntry(
+                items,
+                {item["id"]: item for item in items},
+                time.monotonic() + self.ttl,
+                version,
+                body.etag,
+                body,
+                bodies_by_id,
+            )
+            if generation == self._generations[entity]:
+                self._entries[entity] = entry
+            return entry
+
+    async def list(self, entity: str) -> List[dict]:
+        return (await self.load(entity)).items
+
+    async def get(self, entity: str, entity_id: str) -> Optional[dict]:
+        return (await self.load(entity)).by_id.get(entity_id)
+
+    async def storefront(self) -> Tuple[EncodedBody, str]:
+        # Encoded home page payload and its ETag. Built once from the current
+        # entries and shared by every request until one of them is rebuilt.
+        entries = [await self.load(entity) for entity in CATALOG_ENTITIES]
+        cached = self._storefront
+        if cached and all(old is new for old, new in zip(cached[0], entries)):
+            return cached[1], cached[2]
+
+        payload = {entity: entry.items for entity, entry in zip(CATALOG_ENTITIES, entries)}
+        # Identifies the content, like the ETags, so every worker sends the same bytes
+        payload["version"] = hashlib.sha256("".join(entry.etag for entry in entries).encode()).hexdigest()[:16]
+        body = EncodedBody(orjson.dumps(payload))
+        self._storefront = (entries, body, body.etag)
+        return body, body.etag
+
+    async def price_index(self) -> Dict[Tuple[str, str], dict]:
+        # (game_id, package amount) -> package, for the active games. Rebuilt
+        # only when the games snapshot changes; lookups are a dict get.
+        entry = await self.load("games")
+        cached = self._price_index
+        if cached and cached[0] is entry:
+            return cached[1]
+
+        index = {
+            (game["id"], package["amount"]): package
+            for game in entry.items
+            for package in game.get("prices", [])
+        }
+        self._price_index = (entry, index)
+        return index
+
+    async def search(self, query: str, limit: int = 20) -> List[dict]:
+        # Active games matching `query`, best first. The index is re-synced
+        # when the games snapshot changes; only games that differ from the
+        # indexed copy are re-indexed.
+        entry = await self.load("games")
+        if self._search_entry is not entry:
+            self._search.sync(entry.items)
+            self._search_entry = entry
+        return [entry.by_id[game_id] for game_id in self._search.search(query, limit)]
+
+    def search_metrics(self) -> dict:
+        return self._search.metrics()
+
+    def invalidate(self, entity: str):
+        # Synchronous on purpose: no await point between the bump and the drop
+        self._generations[entity] += 1
+        self._entries.pop(entity, None)
+        self.version += 1
@@ -0,0 +1,224 @@
+"""
+Catalog change events, pushed to storefronts over server-sent events.
+
+Admin writes publish an event (entity, id, op, version, item) into the
+catalog_events collection, numbered from a global counter in meta; that
+number is the event's version and its SSE id. Every worker polls the
+collection, so events reach clients connected to any worker, and a worker
+that sees a change made elsewhere drops the affected catalog cache entry
+instead of waiting for the TTL.
+
+Clients that reconnect send Last-Event-ID and get the events they missed
+from a per-worker buffer; if those are no longer available they get a
+"reset" event and should refetch /api/storefront.
+
+A stream only ends when its client goes away, but uvicorn waits for every
+open connection before running the lifespan shutdown. So close_streams() is
+called as soon as the server starts shutting down (see serve.py): streams end
+without a reset and clients reconnect, to another worker, where they left off.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+from pymongo import ReturnDocument
+
+from catalog import CatalogCache
+from repositories import Database
+
+CATALOG_EVENTS_POLL_INTERVAL = float(os.environ.get('CATALOG_EVENTS_POLL_INTERVAL', '0.5'))
+CATALOG_EVENTS_KEEPALIVE = float(os.environ.get('CATALOG_EVENTS_KEEPALIVE', '15'))
+# Events kept in Mongo and in each worker's replay buffer
+CATALOG_EVENTS_RETAIN = 1000
+# A client this far behind is sent "reset" and disconnected
+SUBSCRIBER_QUEUE_SIZE = 256
+# Versions are handed out before the insert, so another worker's events can land
+# behind one we already polled. Skipped versions are looked for again until
+# they show up or this many seconds pass (a failed insert burns its version).
+GAP_TIMEOUT = 30.0
+
+SEQ_ID = "catalog_events_seq"
+
+
+def _format(event: dict) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (event["version"], orjson.dumps(event))
+
+
+class CatalogEvents:
+    def __init__(self, db: Database, catalog: CatalogCache,
+                 poll_interval: float = CATALOG_EVENTS_POLL_INTERVAL):
+        self.db = db
+        self.catalog = catalog
+        self.poll_interval = poll_interval
+        self.origin = uuid.uuid4().hex
+        self.last_version = 0
+        self.published = 0
+        self.closing = False
+        self._polled = 0
+        self._gaps: Dict[int, float] = {}  # missing version -> when first noticed
+        self._recent: "OrderedDict[int, dict]" = OrderedDict()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._poller: Optional[asyncio.Task] = None
+
+    async def start(self):
+        latest = await self.db.catalog_events.collection.find_one({}, sort=[("version", -1)])
+        self.last_version = self._polled = latest["version"] if latest else 0
+        self._poller = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._poller:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+        for queue in list(self._subscribers):
+            self._close(queue)
+
+    def close_streams(self):
+        self.closing = True
+        for queue in list(self._subscribers):
+            self._close(queue)
+
+    # --- publishing -------------------------------------------------------
+
+    async def publish(self, entity: str, op: str, item_id: str):
+        await self.publish_many(entity, [(op, item_id)])
+
+    async def publish_many(self, entity: str, changes: List[Tuple[str, str]]):
+        # The item travels with the event (None once deleted or deactivated),
+        # so clients can apply the change without another request. A batch
+        # costs the same four round trips as a single change.
+        if not changes:
+            return
+        wanted = [item_id for op, item_id in changes if op != "delete"]
+        items = {}
+        if wanted:
+            found = await getattr(self.db, entity).find({"id": {"$in": wanted}, "is_active": True})
+            items = {item["id"]: item for item in found}
+        counter = await self.db.database.meta.find_one_and_update(
+            {"_id": SEQ_ID}, {"$inc": {"seq": len(changes)}}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        first = counter["seq"] - len(changes) + 1
+        events = [
+            {"version": first + offset, "entity": entity, "id": item_id, "op": op,
+             "item": None if op == "delete" else items.get(item_id)}
+            for offset, (op, item_id) in enumerate(changes)
+        ]
+        created_at = datetime.now().isoformat()
+        await self.db.catalog_events.insert_many(
+            [{**event, "origin": self.origin, "created_at": created_at} for event in events]
+        )
+        await self.db.catalog_events.collection.delete_many(
+            {"version": {"$lte": counter["seq"] - CATALOG_EVENTS_RETAIN}}
+        )
+        self.published += len(events)
+        # Local subscribers hear about it now; the poller skips our own events
+        for event in events:
+            self._dispatch(event)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._poll()
+            except Exception as exc:
+                print(f"Catalog events: poll failed: {exc}")
+
+    async def _poll(self):
+        now = time.monotonic()
+        self._gaps = {version: seen for version, seen in self._gaps.items() if now - seen < GAP_TIMEOUT}
+        query = {"version": {"$gt": self._polled}}
+        if self._gaps:
+            query = {"$or": [query, {"version": {"$in": list(self._gaps)}}]}
+        cursor = self.db.catalog_events.collection.find(query, {"_id": 0, "created_at": 0}).sort("version", 1)
+        async for event in cursor:
+            version = event["version"]
+            self._gaps.pop(version, None)
+            if version > self._polled:
+                self._gaps.update(dict.fromkeys(range(self._polled + 1, version), now))
+                self._polled = version
+            if event.pop("origin") == self.origin or version in self._recent:
+                continue
+            self.catalog.invalidate(event["entity"])
+            self._dispatch(event)
+
+    def _dispatch(self, event: dict):
+        self.last_version = max(self.last_version, event["version"])
+        self._recent[event["version"]] = event
+        while len(self._recent) > CATALOG_EVENTS_RETAIN:
+            self._recent.popitem(last=False)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._close(queue)
+
+    def _close(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    # --- streaming --------------------------------------------------------
+
+    def _missed(self, last_event_id: Optional[str]):
+        # Events after last_event_id, or None if the buffer cannot cover the gap
+        try:
+            last = int(last_event_id)
+        except (TypeError, ValueError):
+            return None
+        if last >= self.last_version:
+            return []
+        missed = sorted((event for version, event in self._recent.items() if version > last),
+                        key=lambda event: event["version"])
+        if not missed or missed[0]["version"] != last + 1:
+            return None
+        return missed
+
+    async def stream(self, is_disconnected, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        if self.closing:
+            return
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            yield b"retry: 3000\n\n"
+            if last_event_id is not None:
+                missed = self._missed(last_event_id)
+                if missed is None:
+                    yield b"event: reset\ndata: {}\n\n"
+                else:
+                    for event in missed:
+                        yield _format(event)
+            yield b"event: ready\ndata: %s\n\n" % orjson.dumps({"version": self.last_version})
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), CATALOG_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    # Too slow to keep up: make it start over. When shutting
+                    # down, just end; the client resumes from its last id.
+                    if not self.closing:
+                        yield b"event: reset\ndata: {}\n\n"
+                    return
+                yield _format(event)
+        finally:
+            self._subscribers.discard(queue)
+
+    def metrics(self) -> dict:
+        return {
+            "version": self.last_version,
+            "published": self.published,
+            "subscribers": len(self._subscribers),
+        }
@@ -0,0 +1,136 @@
+"""
+Idempotency-Key support for POST /api/orders.
+
+A client that retries checkout sends the same Idempotency-Key header with
+every attempt. The first request claims the key in the idempotency_keys
+collection and stores its response there once the order is placed; retries
+get that response back, looked up by _id, instead of creating a second order.
+Responses are also kept in a small per-worker cache so most replays never
+reach Mongo. Keys expire through a TTL index on expires_at.
+
+A retry that arrives while the first attempt is still running gets
+IdempotencyInProgress (409); reusing a key for a different order body gets
+IdempotencyMismatch (422).
+
+complete() runs after the order is placed, so it never raises: the response
+is cached in this worker at once, and a failed Mongo write is retried in the
+background while the claim's lease still blocks other workers.
+"""
+
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+import orjson
+from pymongo.errors import DuplicateKeyError
+
+from lru import TTLCache
+
+IDEMPOTENCY_KEY_TTL = float(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000'))
+# A claim left behind by a request that died mid-flight frees up after this
+IDEMPOTENCY_PENDING_LEASE = 30.0
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Storing a response is retried this many times, the delay doubling from
+# IDEMPOTENCY_STORE_RETRY_DELAY; the total stays well inside the lease
+IDEMPOTENCY_STORE_RETRIES = 5
+IDEMPOTENCY_STORE_RETRY_DELAY = 0.5
+
+
+class IdempotencyInProgress(Exception):
+    pass
+
+
+class IdempotencyMismatch(Exception):
+    pass
+
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, collection, ttl: float = IDEMPOTENCY_KEY_TTL,
+                 cache_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.collection = collection
+        self.ttl = ttl
+        self.replayed = 0
+        self.store_failures = 0
+        self._cache = TTLCache(cache_size, ttl)
+        self._retries: Set[asyncio.Task] = set()
+
+    async def begin(self, key: str, request_hash: str) -> Optional[dict]:
+        # The stored response for a replayed key, or None once this request
+        # holds the key and should go ahead
+        cached = self._cache.get(key)
+        if cached is None:
+            now = datetime.now(timezone.utc)
+            try:
+                # Same trick as mongo_lock: only a missing or expired key
+                # matches, a live one makes the upsert collide
+                await self.collection.update_one(
+                    {"_id": key, "expires_at": {"$lt": now}},
+                    {"$set": {"request_hash": request_hash, "response": None,
+                              "expires_at": now + timedelta(seconds=IDEMPOTENCY_PENDING_LEASE)}},
+                    upsert=True,
+                )
+                return None
+            except DuplicateKeyError:
+                cached = await self.collection.find_one({"_id": key})
+                if cached is None:  # expired and removed in between
+                    return await self.begin(key, request_hash)
+            if cached["response"] is None:
+                raise IdempotencyInProgress(key)
+            self._cache.set(key, cached)
+        if cached["request_hash"] != request_hash:
+            raise IdempotencyMismatch(key)
+        self.replayed += 1
+        return cached["response"]
+
+    async def complete(self, key: str, request_hash: str, response: dict):
+        record = {"request_hash": request_hash, "response": response}
+        self._cache.set(key, record)
+        try:
+            await self._store(key, record)
+        except Exception as exc:
+            self.store_failures += 1
+            print(f"Idempotency: storing the response for {key} failed, retrying: {exc}")
+            task = asyncio.create_task(self._retry_store(key, record))
+            self._retries.add(task)
+            task.add_done_callback(self._retries.discard)
+
+    async def _store(self, key: str, record: dict):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {**record, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)}},
+        )
+
+    async def _retry_store(self, key: str, record: dict):
+        delay = IDEMPOTENCY_STORE_RETRY_DELAY
+        for attempt in range(IDEMPOTENCY_STORE_RETRIES):
+            await asyncio.sleep(delay)
+            delay *= 2
+            try:
+                await self._store(key, record)
+                return
+            except Exception as exc:
+                self.store_failures += 1
+                error = exc
+        # Only this worker can replay the key now; once the lease runs out a
+        # retry reaching another worker places the order again
+        print(f"Idempotency: giving up on storing the response for {key}: {error}")
+
+    async def stop(self):
+        # Lets pending retries finish rather than drop them with the worker
+        if self._retries:
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    async def release(self, key: str):
+        # The request failed: let a retry try again rather than wait out the lease
+        await self.collection.delete_one({"_id": key, "response": None})
+
+    def metrics(self) -> dict:
+        return {"replayed": self.replayed, "store_failures": self.store_failures,
+                "pending_stores": len(self._retries), "cache": self._cache.metrics()}
@@ -0,0 +1,294 @@
+"""
+Resized, re-encoded copies of catalog images (game and banner image_url).
+
+The storefront used to load full-size originals straight from the image host.
+/api/images/{entity}/{id} instead serves a WebP or JPEG variant at one of a few
+fixed widths. Each original is fetched once; it and every variant made from
+it live in IMAGE_CACHE_DIR, which is trimmed back under IMAGE_CACHE_MAX_BYTES
+by evicting the least recently used files.
+
+Only URLs stored on catalog documents are ever fetched, so the endpoint cannot
+be used as an open proxy. Where originals come from is pluggable: HttpFetcher
+in production, FileFetcher (IMAGE_SOURCE_DIR) for tests and offline setups.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Set, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from PIL import Image, UnidentifiedImageError
+
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+IMAGE_WIDTHS = tuple(sorted(int(w) for w in os.environ.get('IMAGE_WIDTHS', '160,320,640,1280').split(',')))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', '10'))
+IMAGE_MAX_SOURCE_BYTES = int(os.environ.get('IMAGE_MAX_SOURCE_BYTES', str(20 * 1024 * 1024)))
+# Read originals from this directory instead of the network (tests, offline dev)
+IMAGE_SOURCE_DIR = os.environ.get('IMAGE_SOURCE_DIR')
+
+IMAGE_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+class ImageUnavailable(Exception):
+    pass
+
+
+class Fetcher(Protocol):
+    async def fetch(self, url: str) -> bytes: ...
+    async def close(self) -> None: ...
+
+
+class HttpFetcher:
+    def __init__(self, timeout: float = IMAGE_FETCH_TIMEOUT, max_bytes: int = IMAGE_MAX_SOURCE_BYTES):
+        self.max_bytes = max_bytes
+        self._client = httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+
+    async def fetch(self, url: str) -> bytes:
+        if urlparse(url).scheme not in ("http", "https"):
+            raise ImageUnavailable(f"unsupported image URL: {url}")
+        try:
+            async with self._client.stream("GET", url) as response:
+                response.raise_for_status()
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > self.max_bytes:
+                        raise ImageUnavailable(f"image larger than {self.max_bytes} bytes: {url}")
+                return bytes(body)
+        except httpx.HTTPError as exc:
+            raise ImageUnavailable(f"fetching {url} failed: {exc}") from exc
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class FileFetcher:
+    # Resolves a URL to a file in `root` by its last path segment
+    def __init__(self, root: str):
+        self.root = root
+
+    async def fetch(self, url: str) -> bytes:
+        name = os.path.basename(urlparse(url).path)
+        try:
+            return await asyncio.to_thread(_read_file, os.path.join(self.root, name))
+        except OSError as exc:
+            raise ImageUnavailable(f"no local file for {url}: {exc}") from exc
+
+    async def close(self):
+        pass
+
+
+def _render(original: bytes, width: int, fmt: str) -> bytes:
+    try:
+        image = Image.open(io.BytesIO(original))
+        image.load()
+    except (UnidentifiedImageError, OSError) as exc:
+        raise ImageUnavailable(f"not a readable image: {exc}") from exc
+    if image.width > width:  # never upscale
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+    out = io.BytesIO()
+    if fmt == "webp":
+        image.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as cached:
+        return cached.read()
+
+
+def _write_file(path: str, data: bytes):
+    # Atomic: readers (other workers included) never see a partial file
+    tmp = f"{path}.{os.getpid()}.{id(data)}.tmp"
+    with open(tmp, "wb") as cached:
+        cached.write(data)
+    os.replace(tmp, path)
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def snap_width(width: Optional[int]) -> int:
+    # Round up to the nearest width we produce so the cache stays small
+    if not width:
+        return IMAGE_WIDTHS[-1]
+    return next((w for w in IMAGE_WIDTHS if w >= width), IMAGE_WIDTHS[-1])
+
+
+# Disk cache with an in-memory LRU index of file sizes. Several workers may
+# share the directory; each keeps its own index, and a file another worker
+# evicted is simply rebuilt.
+class ImageCache:
+    def __init__(self, fetcher: Fetcher, cache_dir: str = IMAGE_CACHE_DIR,
+                 max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.evictions = 0
+        self.errors = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._prewarming: Set[asyncio.Task] = set()
+
+    def start(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._bytes += size
+
+    async def stop(self):
+        for task in list(self._prewarming):
+            task.cancel()
+        await asyncio.gather(*self._prewarming, return_exceptions=True)
+        await self.fetcher.close()
+
+    # --- disk index -------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    # The index is only touched on the event loop; file IO runs in threads.
+    async def _read(self, name: str) -> Optional[bytes]:
+        if name not in self._index:
+            return None
+        try:
+            data = await asyncio.to_thread(_read_file, self._path(name))
+        except FileNotFoundError:
+            self._bytes -= self._index.pop(name, 0)
+            return None
+        if name in self._index:
+            self._index.move_to_end(name)
+        return data
+
+    async def _write(self, name: str, data: bytes):
+        await asyncio.to_thread(_write_file, self._path(name), data)
+        self._bytes += len(data) - self._index.pop(name, 0)
+        self._index[name] = len(data)
+        victims = []
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            victim, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            victims.append(self._path(victim))
+        if victims:
+            await asyncio.to_thread(_remove_files, victims)
+
+    # --- variants ---------------------------------------------------------
+
+    async def _single_flight(self, name: str, build):
+        # Concurrent requests for the same file share one fetch / resize
+        pending = self._inflight.get(name)
+        if pending:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[name] = future
+        try:
+            data = await build()
+            future.set_result(data)
+            return data
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved: waiters re-raise it, nobody else needs to
+            raise
+        finally:
+            del self._inflight[name]
+
+    async def _original(self, url: str, key: str) -> bytes:
+        name = f"{key}.orig"
+        data = await self._read(name)
+        if data is not None:
+            return data
+
+        async def build():
+            self.fetches += 1
+            original = await self.fetcher.fetch(url)
+            await self._write(name, original)
+            return original
+        return await self._single_flight(name, build)
+
+    async def variant(self, url: str, width: int, fmt: str) -> Tuple[bytes, str]:
+        # (image bytes, cache key usable as an ETag)
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        name = f"{key}-{width}.{fmt}"
+        data = await self._read(name)
+        if data is not None:
+            self.hits += 1
+            return data, name
+
+        self.misses += 1
+
+        async def build():
+            original = await self._original(url, key)
+            rendered = await asyncio.to_thread(_render, original, width, fmt)
+            await self._write(name, rendered)
+            return rendered
+        try:
+            return await self._single_flight(name, build), name
+        except ImageUnavailable:
+            self.errors += 1
+            raise
+
+    def prewarm(self, url: Optional[str]):
+        # Fire-and-forget: build every variant of a freshly saved image
+        if not url:
+            return
+
+        async def run():
+            for width in IMAGE_WIDTHS:
+                for fmt in IMAGE_FORMATS:
+                    try:
+                        await self.variant(url, width, fmt)
+                    except ImageUnavailable as exc:  # counted by variant()
+                        print(f"Image prewarm failed: {exc}")
+                        return
+                    except Exception as exc:
+                        # Nobody awaits this task, so anything else would be lost
+                        self.errors += 1
+                        print(f"Image prewarm failed for {url}: {exc!r}")
+                        return
+        task = asyncio.create_task(run())
+        self._prewarming.add(task)
+        task.add_done_callback(self._prewarming.discard)
+
+    def metrics(self) -> dict:
+        return {
+            "files": len(self._index),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "prewarming": len(self._prewarming),
+        }
+
+
+def default_fetcher() -> Fetcher:
+    return FileFetcher(IMAGE_SOURCE_DIR) if IMAGE_SOURCE_DIR else HttpFetcher()
@@ -0,0 +1,159 @@
+"""
+Index management for the gaming_store database.
+
+INDEX_SPECS is the source of truth. Bump INDEX_SPEC_VERSION whenever it
+changes so that running servers pick the new indexes up on their next start.
+
+    python indexes.py            # create missing indexes, then report problems
+    python indexes.py --check    # report only, exit 1 if anything is off
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from repositories import Database
+
+INDEX_SPEC_VERSION = 6
+
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "games": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING)], name="is_active_created_at"),
+    ],
+    "news": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING)], name="is_active_created_at"),
+    ],
+    "banners": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("is_active", ASCENDING), ("created_at", DESCENDING)], name="is_active_created_at"),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "admins": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="user_id_created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="status_created_at_id"),
+        IndexModel([("game_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="game_id_created_at_id"),
+    ],
+    "sales_rollups": [
+        IndexModel([("day", ASCENDING)], name="day"),
+        IndexModel([("game_id", ASCENDING), ("day", ASCENDING)], name="game_id_day"),
+    ],
+    "catalog_events": [
+        IndexModel([("version", ASCENDING)], name="version_unique", unique=True),
+    ],
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+def _key(fields) -> tuple:
+    # index_information() may report directions as floats (1.0); normalise
+    return tuple((field, int(direction)) for field, direction in fields)
+
+
+async def _diff(db: Database, collection_name: str):
+    # Compare live indexes to the spec by key pattern, since an equivalent index
+    # may exist under a different name. Returns (missing specs, problem strings).
+    existing = await db.database[collection_name].index_information()
+    by_key = {_key(info["key"]): (name, info) for name, info in existing.items()}
+
+    missing, problems = [], []
+    for spec in INDEX_SPECS[collection_name]:
+        document = spec.document
+        key = _key(document["key"].items())
+        found = by_key.get(key)
+        if not found:
+            missing.append(spec)
+            problems.append(f"{collection_name}: missing index {document['name']} {list(key)}")
+            continue
+
+        name, info = found
+        if bool(info.get("unique")) != bool(document.get("unique")):
+            problems.append(
+                f"{collection_name}: index {name} {list(key)} has unique={bool(info.get('unique'))}, "
+                f"expected unique={bool(document.get('unique'))}"
+            )
+        if info.get("expireAfterSeconds") != document.get("expireAfterSeconds"):
+            problems.append(
+                f"{collection_name}: index {name} {list(key)} has expireAfterSeconds="
+                f"{info.get('expireAfterSeconds')}, expected {document.get('expireAfterSeconds')}"
+            )
+    return missing, problems
+
+
+async def verify_indexes(db: Database) -> List[str]:
+    problems = []
+    for collection_name in INDEX_SPECS:
+        problems.extend((await _diff(db, collection_name))[1])
+    return problems
+
+
+async def ensure_indexes(db: Database, force: bool = False) -> List[str]:
+    # Creates whatever is missing and returns the remaining problems. Indexes that
+    # exist but differ from the spec are reported, never dropped automatically.
+    meta = db.database.meta
+    applied = await meta.find_one({"_id": "indexes"})
+    if applied and applied.get("version", 0) >= INDEX_SPEC_VERSION and not force:
+        return []
+
+    for collection_name in INDEX_SPECS:
+        missing, _ = await _diff(db, collection_name)
+        if not missing:
+            continue
+        try:
+            await db.database[collection_name].create_indexes(missing)
+        except OperationFailure as exc:
+            # e.g. duplicate values blocking a unique index; surfaces in the report below
+            print(f"Index creation failed on {collection_name}: {exc}")
+
+    problems = await verify_indexes(db)
+    if not problems:
+        await meta.update_one(
+            {"_id": "indexes"},
+            {"$set": {"version": INDEX_SPEC_VERSION, "applied_at": datetime.now().isoformat()}},
+            upsert=True,
+        )
+    return problems
+
+
+async def _main(check_only: bool) -> int:
+    db = Database(AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017')))
+    try:
+        problems = await (verify_indexes(db) if check_only else ensure_indexes(db, force=True))
+    finally:
+        db.close()
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print(f"✅ Indexes match spec version {INDEX_SPEC_VERSION}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and verify gaming_store indexes")
+    parser.add_argument("--check", action="store_true", help="only report, do not create anything")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.check)))
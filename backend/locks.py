@@ -0,0 +1,44 @@
+"""
+Lease-based mutual exclusion across processes, stored in the meta collection.
+
+Used to serialise startup work (index builds, seeding) when several workers
+or replicas boot at once. The lease expires on its own, so a process that
+dies while holding it blocks the others for at most `lease` seconds.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from pymongo.errors import DuplicateKeyError
+
+from repositories import Database
+
+
+@asynccontextmanager
+async def mongo_lock(db: Database, name: str, lease: float = 60.0, poll_interval: float = 0.25):
+    meta = db.database.meta
+    lock_id = f"lock:{name}"
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    while True:
+        now = time.time()
+        try:
+            # Matches only a free or expired lease; if another process holds
+            # it, the upsert collides with its document instead.
+            await meta.update_one(
+                {"_id": lock_id, "expires_at": {"$lt": now}},
+                {"$set": {"owner": owner, "expires_at": now + lease}},
+                upsert=True,
+            )
+            break
+        except DuplicateKeyError:
+            await asyncio.sleep(poll_interval)
+
+    try:
+        yield
+    finally:
+        await meta.delete_one({"_id": lock_id, "owner": owner})
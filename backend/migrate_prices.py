@@ -0,0 +1,88 @@
+"""
+Convert game price packages to the typed PricePackage shape.
+
+Older games store every package field as a string, e.g.
+{"amount": "70 عملة", "price": "5", "currency": "ريال"}. This rewrites them as
+{"amount": "70 عملة", "quantity": 70, "price": 5.0, "currency": "ريال"}; the
+amount label is kept for display. Games already in the new shape are left
+alone, so the job can be run any number of times.
+
+A game with a price that is not a plain number (e.g. "5 ريال") is not
+migrated: storing it as 0 would let customers order that package for free.
+Such games are listed and the job exits 1 until they are fixed by hand.
+
+    python migrate_prices.py [--dry-run]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+from typing import List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from pricing import PricePackage
+from repositories import Database
+
+
+def strict_price(value) -> float:
+    # Unlike pricing.parse_price, refuses to turn unreadable prices into 0
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"price {value!r} is not a number")
+    if not math.isfinite(price) or price < 0:
+        raise ValueError(f"price {value!r} is not a valid amount")
+    return price
+
+
+def migrate_packages(prices: List[dict]) -> List[dict]:
+    return [
+        PricePackage(**{**package, "price": strict_price(package.get("price"))}).dict()
+        for package in prices
+    ]
+
+
+async def migrate(db: Database, dry_run: bool = False) -> Tuple[int, int, List[str]]:
+    # (games scanned, games migrated, problems with the games left untouched)
+    scanned, changed, problems = 0, [], []
+    async for game in db.games.collection.find({}, {"_id": 1, "id": 1, "name": 1, "prices": 1}):
+        scanned += 1
+        prices = game.get("prices") or []
+        try:
+            migrated = migrate_packages(prices)
+        except ValueError as exc:
+            problems.append(f"{game.get('id', game['_id'])} ({game.get('name', '?')}): {exc}")
+            continue
+        if migrated != prices:
+            changed.append(UpdateOne({"_id": game["_id"]}, {"$set": {"prices": migrated}}))
+
+    if changed and not dry_run:
+        await db.games.collection.bulk_write(changed, ordered=False)
+    return scanned, len(changed), problems
+
+
+async def _main(dry_run: bool) -> int:
+    db = Database(AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017')))
+    try:
+        scanned, changed, problems = await migrate(db, dry_run)
+    finally:
+        db.close()
+    verb = "would be migrated" if dry_run else "migrated"
+    print(f"{'❌' if problems else '✅'} {scanned} games scanned, {changed} {verb}")
+    if problems:
+        print(f"   {len(problems)} games skipped, fix their prices and run again:")
+        for problem in problems:
+            print(f"   - {problem}")
+    print("   Running servers pick the change up when their catalog cache expires.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert game prices to numeric packages")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.dry_run)))
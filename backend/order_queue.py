@@ -0,0 +1,301 @@
+"""
+Write-behind ingestion for new orders.
+
+create_order appends the order to a local append-only journal and returns as
+soon as that write has been fsynced; a background flusher then moves journaled
+orders into Mongo with insert_many. Concurrent checkouts share one fsync
+(group commit), so durability costs one disk sync per burst, not per order.
+
+The journal is a series of NDJSON segment files. The flusher rotates the
+active segment, inserts its orders in batches and only then deletes the file.
+On startup every segment left behind is replayed. Replays are idempotent
+because orders.id has a unique index and duplicate-key errors are ignored.
+
+Each process claims its own slot directory under ORDER_JOURNAL_DIR with an
+exclusive lock, so several workers can share one journal directory and a
+restarted worker picks up whatever a crashed one left in its slot. Slots
+nobody claims (the deployment came back with fewer workers) are adopted at
+startup: their segments are moved into the starting worker's slot.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+
+ORDER_JOURNAL_DIR = os.environ.get('ORDER_JOURNAL_DIR', 'order_journal')
+ORDER_FLUSH_BATCH_SIZE = int(os.environ.get('ORDER_FLUSH_BATCH_SIZE', '100'))
+ORDER_FLUSH_INTERVAL = float(os.environ.get('ORDER_FLUSH_INTERVAL', '0.2'))
+
+DUPLICATE_KEY = 11000
+
+
+def _fsync_all(files):
+    for journal_file in files:
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+
+def _segment_names(slot_dir: str) -> List[str]:
+    return sorted(
+        (name for name in os.listdir(slot_dir) if name.endswith(".journal")),
+        key=lambda name: int(name.split(".")[0]),
+    )
+
+
+def _fsync_dir(path: str):
+    # Makes renames into the directory durable
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Segment:
+    def __init__(self, path: str, journal_file=None):
+        self.path = path
+        self.file = journal_file
+        self.orders: List[dict] = []
+        self.enqueued_at: List[float] = []
+        self.last_seq = 0
+
+
+class OrderQueue:
+    def __init__(self, collection: AsyncIOMotorCollection, journal_dir: str = ORDER_JOURNAL_DIR,
+                 batch_size: int = ORDER_FLUSH_BATCH_SIZE, flush_interval: float = ORDER_FLUSH_INTERVAL,
+                 on_inserted: Optional[Callable[[List[dict]], Awaitable]] = None):
+        self.collection = collection
+        # Called with the orders each batch actually inserted (replayed duplicates excluded)
+        self.on_inserted = on_inserted
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.flush_errors = 0
+
+        self._slot_dir: Optional[str] = None
+        self._lock_file = None
+        self._next_segment = 0
+        self._active: Optional[Segment] = None
+        self._sealed: "deque[Segment]" = deque()
+
+        self._write_seq = 0
+        self._synced_seq = 0
+        self._dirty = set()
+        self._sync_task: Optional[asyncio.Task] = None
+
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    # --- lifecycle -------------------------------------------------------
+
+    def _claim_slot(self):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        slot = 0
+        while True:
+            slot_dir = os.path.join(self.journal_dir, f"slot-{slot}")
+            os.makedirs(slot_dir, exist_ok=True)
+            lock_file = open(os.path.join(slot_dir, "lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                slot += 1
+                continue
+            self._slot_dir, self._lock_file = slot_dir, lock_file
+            return
+
+    def _load_segment(self, path: str):
+        # Segments left by a previous run are sealed as-is. A torn last line
+        # was never acknowledged (its fsync did not complete), so it is dropped.
+        segment = Segment(path)
+        with open(path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    segment.orders.append(json.loads(line))
+                except ValueError:
+                    break
+        segment.enqueued_at = [time.monotonic()] * len(segment.orders)
+        self._sealed.append(segment)
+        return segment
+
+    def _replay(self):
+        names = _segment_names(self._slot_dir)
+        for name in names:
+            self._load_segment(os.path.join(self._slot_dir, name))
+            self._next_segment = int(name.split(".")[0]) + 1
+        if names:
+            print(f"Order journal: replaying {sum(len(s.orders) for s in self._sealed)} orders "
+                  f"from {len(names)} segment(s) in {self._slot_dir}")
+
+    def _adopt_orphans(self):
+        # Segments in a slot no running process holds were acknowledged to
+        # customers but would never be replayed by anyone else. Holding the
+        # slot's lock while moving them keeps a worker starting up at the same
+        # time from claiming (and replaying) them too.
+        for slot in os.listdir(self.journal_dir):
+            slot_dir = os.path.join(self.journal_dir, slot)
+            if not slot.startswith("slot-") or slot_dir == self._slot_dir or not os.path.isdir(slot_dir):
+                continue
+            with open(os.path.join(slot_dir, "lock"), "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # a live worker owns it and replays it itself
+                names = _segment_names(slot_dir)
+                if not names:
+                    continue
+                adopted = 0
+                for name in names:
+                    path = os.path.join(self._slot_dir, f"{self._next_segment}.journal")
+                    self._next_segment += 1
+                    os.replace(os.path.join(slot_dir, name), path)
+                    adopted += len(self._load_segment(path).orders)
+                _fsync_dir(self._slot_dir)
+                print(f"Order journal: adopted {adopted} orders from {len(names)} segment(s) "
+                      f"in unclaimed {slot_dir}")
+
+    def _open_segment(self):
+        path = os.path.join(self._slot_dir, f"{self._next_segment}.journal")
+        self._next_segment += 1
+        self._active = Segment(path, open(path, "a", encoding="utf-8"))
+
+    async def start(self):
+        self._claim_slot()
+        self._replay()
+        self._adopt_orphans()
+        self._open_segment()
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception as exc:
+            # Whatever is left stays in the journal and is replayed next start
+            print(f"Order journal: final flush failed: {exc}")
+        if self._active and self._active.file:
+            self._active.file.close()
+        if self._lock_file:
+            self._lock_file.close()
+
+    # --- enqueue (durable acknowledgement) --------------------------------
+
+    async def enqueue(self, order: dict):
+        segment = self._active
+        segment.file.write(json.dumps(order, ensure_ascii=False) + "\n")
+        segment.orders.append(dict(order))
+        segment.enqueued_at.append(time.monotonic())
+        self._dirty.add(segment.file)
+        self._write_seq += 1
+        segment.last_seq = seq = self._write_seq
+        self.enqueued += 1
+
+        if len(segment.orders) >= self.batch_size:
+            self._wakeup.set()
+        await self._wait_synced(seq)
+
+    async def _wait_synced(self, seq: int):
+        while self._synced_seq < seq:
+            if self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._sync())
+            await asyncio.shield(self._sync_task)
+
+    async def _sync(self):
+        # Group commit: one fsync covers every write made before it started
+        seq = self._write_seq
+        files = list(self._dirty)
+        self._dirty.clear()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _fsync_all, files)
+        except BaseException:
+            # Nothing is known to be on disk: the next sync has to cover these too
+            self._dirty.update(files)
+            raise
+        else:
+            self._synced_seq = max(self._synced_seq, seq)
+        finally:
+            self._sync_task = None
+
+    # --- flushing ---------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                self.flush_errors += 1
+                print(f"Order journal: flush failed, will retry: {exc}")
+
+    async def _insert(self, orders: List[dict]):
+        inserted = orders
+        try:
+            await self.collection.insert_many([dict(order) for order in orders], ordered=False)
+        except BulkWriteError as exc:
+            # Already inserted by an earlier, interrupted flush
+            details = exc.details
+            if details.get("writeConcernErrors") or any(
+                error["code"] != DUPLICATE_KEY for error in details.get("writeErrors", [])
+            ):
+                raise
+            duplicates = {error["index"] for error in details["writeErrors"]}
+            inserted = [order for index, order in enumerate(orders) if index not in duplicates]
+
+        if self.on_inserted and inserted:
+            try:
+                await self.on_inserted(inserted)
+            except Exception as exc:
+                # Derived data only; never block or repeat the order insert for it
+                print(f"Order journal: on_inserted hook failed: {exc}")
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._active and self._active.orders:
+                self._sealed.append(self._active)
+                self._open_segment()
+
+            while self._sealed:
+                segment = self._sealed[0]
+                await self._wait_synced(segment.last_seq)
+                for start in range(0, len(segment.orders), self.batch_size):
+                    await self._insert(segment.orders[start:start + self.batch_size])
+
+                if segment.file:
+                    segment.file.close()
+                os.remove(segment.path)
+                self._sealed.popleft()
+                self.flushed += len(segment.orders)
+
+    # --- metrics ----------------------------------------------------------
+
+    def metrics(self) -> dict:
+        segments = list(self._sealed) + ([self._active] if self._active else [])
+        oldest = min((s.enqueued_at[0] for s in segments if s.enqueued_at), default=None)
+        return {
+            "depth": sum(len(s.orders) for s in segments),
+            "lag_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+            "segments": len(segments),
+        }
@@ -0,0 +1,38 @@
+import re
+from typing import Optional
+
+from pydantic import BaseModel, model_validator
+
+_NUMBER = re.compile(r"\d+")
+
+
+def parse_price(value) -> float:
+    # Legacy documents store prices as strings ("5"); anything non-numeric is 0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_quantity(amount: str) -> Optional[int]:
+    # "70 عملة" -> 70. \d also matches Arabic-Indic digits, which int() accepts.
+    match = _NUMBER.search(amount or "")
+    return int(match.group()) if match else None
+
+
+def format_price(value: float) -> str:
+    # 5.0 -> "5", 4.5 -> "4.5": what customers expect to read
+    return f"{value:g}"
+
+
+class PricePackage(BaseModel):
+    amount: str                     # display label, e.g. "70 عملة"
+    quantity: Optional[int] = None  # parsed from amount when not given
+    price: float
+    currency: str
+
+    @model_validator(mode="after")
+    def fill_quantity(self):
+        if self.quantity is None:
+            self.quantity = parse_quantity(self.amount)
+        return self
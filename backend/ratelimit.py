@@ -0,0 +1,130 @@
+"""
+Admission control for the endpoints a scripted client can abuse: order
+creation (Mongo inserts) and the login / register routes (password hashing).
+
+Each route has token buckets keyed by client IP and, where the request names
+one, by account (username, or the signed-in user for orders), plus an
+optional bucket shared by everyone that sheds load once the route as a whole
+is too busy. A request must find a token in every bucket that applies, or it
+is rejected with 429 and Retry-After before the handler touches Mongo or the
+password pool.
+
+Limits are written "N/S": bursts of N, refilled at N per S seconds, e.g.
+RATE_LIMIT_LOGIN_ACCOUNT=5/60. An empty value turns that bucket off. State is
+kept per worker, so with WEB_CONCURRENCY > 1 a client spread across workers
+gets up to that many times the limit. Behind a proxy, client IPs are only
+right once FORWARDED_ALLOW_IPS names it (see serve.py).
+
+Run load tests, or backend_test.py many times in a row from one host, against
+a server started with RATE_LIMIT_ENABLED=false. backend_test.py's own rate
+limit check expects the defaults and fails in that case.
+"""
+
+import os
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+from lru import TTLCache
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Tracked keys per bucket; the least recently used are dropped beyond this
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+
+# route -> scope -> default limit
+DEFAULT_LIMITS = {
+    "orders": {"ip": "30/60", "account": "10/60", "global": "200/1"},
+    "login": {"ip": "20/60", "account": "5/60", "global": "50/1"},
+    # Charged before the duplicate username / email checks, so probing for
+    # taken names costs tokens too; sized for a few sign-ups per household
+    "register": {"ip": "20/3600", "global": "20/1"},
+    "admin_login": {"ip": "10/60", "account": "5/60"},
+}
+
+
+class RateLimited(Exception):
+    def __init__(self, route: str, retry_after: float):
+        super().__init__(f"{route}: rate limited")
+        self.route = route
+        self.retry_after = retry_after
+
+
+def parse_limit(spec: str) -> Optional[Tuple[float, float]]:
+    # "N/S" -> (capacity, tokens per second)
+    if not spec.strip():
+        return None
+    count, _, seconds = spec.partition("/")
+    capacity, period = float(count), float(seconds or 1)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"invalid rate limit: {spec!r}")
+    return capacity, capacity / period
+
+
+class TokenBucket:
+    # Buckets for many keys at one limit. Only a (tokens, timestamp) pair is
+    # stored per key, and it expires once the bucket would have refilled: a
+    # key nobody has seen for that long is indistinguishable from a new one.
+    def __init__(self, capacity: float, rate: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.capacity = capacity
+        self.rate = rate
+        self.rejected = 0
+        self._state = TTLCache(max_keys, capacity / rate)
+
+    def available(self, key: Hashable, now: float) -> float:
+        state = self._state.get(key)
+        if state is None:
+            return self.capacity
+        tokens, updated = state
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def wait(self, tokens: float) -> float:
+        # Seconds until one token is available
+        return (1 - tokens) / self.rate
+
+    def take(self, key: Hashable, tokens: float, now: float):
+        tokens -= 1
+        self._state.set(key, (tokens, now), ttl=(self.capacity - tokens) / self.rate)
+
+    def metrics(self) -> dict:
+        return {"capacity": self.capacity, "per_second": self.rate, "keys": len(self._state),
+                "rejected": self.rejected}
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Dict[str, str]] = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.enabled = enabled
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        for route, scopes in (limits or configured_limits()).items():
+            for scope, spec in scopes.items():
+                limit = parse_limit(spec)
+                if limit:
+                    self._buckets[route, scope] = TokenBucket(*limit)
+
+    def check(self, route: str, ip: Optional[str], account: Optional[str] = None):
+        # Takes a token from every applicable bucket, or none of them and raises
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        wanted = []
+        for scope, key in (("global", None), ("ip", ip), ("account", account)):
+            bucket = self._buckets.get((route, scope))
+            if bucket is None or (scope != "global" and not key):
+                continue
+            tokens = bucket.available(key, now)
+            if tokens < 1:
+                bucket.rejected += 1
+                raise RateLimited(route, bucket.wait(tokens))
+            wanted.append((bucket, key, tokens))
+        for bucket, key, tokens in wanted:
+            bucket.take(key, tokens, now)
+
+    def metrics(self) -> dict:
+        return {f"{route}.{scope}": bucket.metrics() for (route, scope), bucket in self._buckets.items()}
+
+
+def configured_limits() -> Dict[str, Dict[str, str]]:
+    # RATE_LIMIT_<ROUTE>_<SCOPE> overrides the defaults above
+    return {
+        route: {scope: os.environ.get(f"RATE_LIMIT_{route.upper()}_{scope.upper()}", spec)
+                for scope, spec in scopes.items()}
+        for route, scopes in DEFAULT_LIMITS.items()
+    }
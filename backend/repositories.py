@@ -0,0 +1,159 @@
+import os
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+
+# Connection pool settings for the server's Motor client. Every worker process
+# has its own pool, so size it per worker. Compressors are negotiated with the
+# server in order of preference; "zlib" needs nothing extra, "zstd" and
+# "snappy" need the zstandard / python-snappy packages.
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+    }
+    socket_timeout = os.environ.get('MONGO_SOCKET_TIMEOUT_MS')
+    if socket_timeout:
+        options["socketTimeoutMS"] = int(socket_timeout)
+    compressors = os.environ.get('MONGO_COMPRESSORS')
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def version_filter(expected_version: Optional[int]) -> dict:
+    # Documents written before versioning have no field and count as version 0
+    if expected_version is None:
+        return {}
+    return {"version": expected_version if expected_version else {"$in": [0, None]}}
+
+
+# Generic async repository around a single Motor collection.
+# Documents are addressed by our own "id" field, never by Mongo's _id.
+class Repository:
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def find(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                   sort: Optional[list] = None) -> List[dict]:
+        cursor = self.collection.find(query or {}, projection or {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        return await cursor.to_list(length=None)
+
+    async def find_active(self) -> List[dict]:
+        return await self.find({"is_active": True})
+
+    async def get(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one(query, projection or {"_id": 0})
+
+    async def get_by_id(self, entity_id: str, **filters) -> Optional[dict]:
+        return await self.get({"id": entity_id, **filters})
+
+    async def count(self, query: Optional[dict] = None) -> int:
+        return await self.collection.count_documents(query or {})
+
+    async def insert(self, document: dict) -> dict:
+        # insert_one adds _id to the dict it is given; keep the caller's copy clean
+        await self.collection.insert_one(dict(document))
+        return document
+
+    async def insert_many(self, documents: List[dict]):
+        await self.collection.insert_many([dict(doc) for doc in documents])
+
+    async def update(self, entity_id: str, fields: dict) -> bool:
+        result = await self.collection.update_one({"id": entity_id}, {"$set": fields})
+        return result.matched_count > 0
+
+    async def update_versioned(self, entity_id: str, fields: dict,
+                               expected_version: Optional[int] = None) -> Optional[int]:
+        # $set plus a version bump; returns the new version. With
+        # expected_version the write only applies if nobody else got there
+        # first; None means no such document at that version.
+        updated = await self.collection.find_one_and_update(
+            {"id": entity_id, **version_filter(expected_version)},
+            {"$set": fields, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return updated["version"] if updated else None
+
+    async def delete(self, entity_id: str) -> bool:
+        result = await self.collection.delete_one({"id": entity_id})
+        return result.deleted_count > 0
+
+    async def versions(self, entity_ids: Iterable[str]) -> Dict[str, int]:
+        # id -> current version for the ids that exist
+        cursor = self.collection.find({"id": {"$in": list(entity_ids)}}, {"_id": 0, "id": 1, "version": 1})
+        return {doc["id"]: doc.get("version") or 0 async for doc in cursor}
+
+    async def bulk_write(self, operations: list, ordered: bool = True) -> Tuple[Dict[int, dict], Dict[str, int]]:
+        # One round trip for the whole batch. Returns the write errors keyed by
+        # operation index (an ordered batch stops at the first of them) and how
+        # many documents the updates matched and the deletes removed.
+        try:
+            result = await self.collection.bulk_write(operations, ordered=ordered)
+        except BulkWriteError as exc:
+            if exc.details.get("writeConcernErrors"):
+                raise
+            counts = {"matched": exc.details.get("nMatched", 0), "deleted": exc.details.get("nRemoved", 0)}
+            return {error["index"]: error for error in exc.details.get("writeErrors", [])}, counts
+        return {}, {"matched": result.matched_count, "deleted": result.deleted_count}
+
+
+class UserRepository(Repository):
+    async def get_by_username(self, username: str, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.get({"username": username}, projection)
+
+    async def email_taken(self, email: str, exclude_id: Optional[str] = None) -> bool:
+        query = {"email": email}
+        if exclude_id:
+            query["id"] = {"$ne": exclude_id}
+        return await self.get(query, {"_id": 1}) is not None
+
+
+class OrderRepository(Repository):
+    async def page(self, query: dict, limit: int, after: Optional[Tuple[str, str]] = None) -> Tuple[List[dict], bool]:
+        # Keyset pagination on (created_at, id), newest first. `after` is the
+        # (created_at, id) of the last order on the previous page.
+        if after:
+            created_at, order_id = after
+            query = {"$and": [query, {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": order_id}},
+            ]}]}
+        cursor = self.collection.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).limit(limit + 1)
+        orders = await cursor.to_list(length=limit + 1)
+        return orders[:limit], len(orders) > limit
+
+    async def stream(self, query: dict, batch_size: int = 1000) -> AsyncIterator[dict]:
+        # Newest first, fetched batch_size documents per round trip
+        cursor = self.collection.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)])
+        async for order in cursor.batch_size(batch_size):
+            yield order
+
+
+# One Database per process, created and closed by the app lifespan
+class Database:
+    def __init__(self, client: AsyncIOMotorClient, name: str = "gaming_store"):
+        self.client = client
+        self.database = db = client[name]
+        self.games = Repository(db.games)
+        self.news = Repository(db.news)
+        self.banners = Repository(db.banners)
+        self.orders = OrderRepository(db.orders)
+        self.admins = Repository(db.admins)
+        self.users = UserRepository(db.users)
+        self.rollups = Repository(db.sales_rollups)
+        self.catalog_events = Repository(db.catalog_events)
+        self.idempotency_keys = Repository(db.idempotency_keys)
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,155 @@
+"""
+Sales rollups: order count and revenue per (day, game, package, currency).
+
+New orders are folded in incrementally with $inc upserts as they are written
+to Mongo. The rebuild job recomputes the whole collection from raw orders;
+run it after a schema change or if the incremental path ever missed orders
+(for example a crash between the order insert and the rollup update).
+Orders written while a rebuild is running may be lost from the result, so
+run it in a quiet period.
+
+    python rollups.py --rebuild
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from pricing import parse_price
+from repositories import Database
+
+
+def rollup_id(day: str, game_id: str, package: str, currency: str) -> str:
+    return f"{day}|{game_id}|{package}|{currency}"
+
+
+async def record_orders(db: Database, orders: Iterable[dict]):
+    # Collapse the batch per key first so a flush of N orders costs one
+    # bulk_write with at most one upsert per rollup row.
+    totals = {}
+    for order in orders:
+        day = order["created_at"][:10]
+        key = rollup_id(day, order["game_id"], order["amount"], order["currency"])
+        row = totals.setdefault(key, {
+            "fields": {"day": day, "game_id": order["game_id"], "game_name": order.get("game_name"),
+                       "package": order["amount"], "currency": order["currency"]},
+            "count": 0,
+            "revenue": 0.0,
+        })
+        row["count"] += 1
+        row["revenue"] += parse_price(order["price"])
+
+    if not totals:
+        return
+    await db.rollups.collection.bulk_write([
+        UpdateOne(
+            {"_id": key},
+            {"$inc": {"count": row["count"], "revenue": row["revenue"]}, "$setOnInsert": row["fields"]},
+            upsert=True,
+        )
+        for key, row in totals.items()
+    ], ordered=False)
+
+
+REBUILD_PIPELINE = [
+    {"$group": {
+        "_id": {
+            "day": {"$substrBytes": ["$created_at", 0, 10]},
+            "game_id": "$game_id",
+            "package": "$amount",
+            "currency": "$currency",
+        },
+        "game_name": {"$last": "$game_name"},
+        "count": {"$sum": 1},
+        "revenue": {"$sum": {"$convert": {"input": "$price", "to": "double", "onError": 0, "onNull": 0}}},
+    }},
+    {"$project": {
+        "_id": {"$concat": ["$_id.day", "|", "$_id.game_id", "|", "$_id.package", "|", "$_id.currency"]},
+        "day": "$_id.day",
+        "game_id": "$_id.game_id",
+        "game_name": 1,
+        "package": "$_id.package",
+        "currency": "$_id.currency",
+        "count": 1,
+        "revenue": 1,
+    }},
+    # $out swaps the result in atomically and keeps the target's indexes
+    {"$out": "sales_rollups"},
+]
+
+
+async def rebuild(db: Database):
+    await db.orders.collection.aggregate(REBUILD_PIPELINE, allowDiskUse=True).to_list(length=None)
+    return await db.rollups.count()
+
+
+def _range(day_from: Optional[str], day_to: Optional[str], game_id: Optional[str]) -> dict:
+    query = {}
+    if day_from or day_to:
+        query["day"] = {}
+        if day_from:
+            query["day"]["$gte"] = day_from
+        if day_to:
+            query["day"]["$lte"] = day_to
+    if game_id:
+        query["game_id"] = game_id
+    return query
+
+
+async def summarize(db: Database, day_from: Optional[str] = None, day_to: Optional[str] = None,
+                    game_id: Optional[str] = None) -> dict:
+    # The rollup collection holds at most days x packages rows, so grouping it
+    # in Python stays cheap however many raw orders there are.
+    rows = await db.rollups.find(_range(day_from, day_to, game_id))
+
+    by_day, by_game, by_package, totals = (defaultdict(lambda: {"count": 0, "revenue": 0.0}) for _ in range(4))
+    names = {}
+    for row in rows:
+        names[row["game_id"]] = row.get("game_name")
+        for bucket, key in (
+            (by_day, (row["day"], row["currency"])),
+            (by_game, (row["game_id"], row["currency"])),
+            (by_package, (row["game_id"], row["package"], row["currency"])),
+            (totals, (row["currency"],)),
+        ):
+            bucket[key]["count"] += row["count"]
+            bucket[key]["revenue"] += row["revenue"]
+
+    def rows_of(bucket, fields) -> List[dict]:
+        return [{**dict(zip(fields, key)), **value} for key, value in sorted(bucket.items())]
+
+    by_game_rows = rows_of(by_game, ("game_id", "currency"))
+    for row in by_game_rows:
+        row["game_name"] = names.get(row["game_id"])
+    return {
+        "totals": rows_of(totals, ("currency",)),
+        "by_day": rows_of(by_day, ("day", "currency")),
+        "by_game": by_game_rows,
+        "by_package": rows_of(by_package, ("game_id", "package", "currency")),
+    }
+
+
+async def _main() -> int:
+    db = Database(AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017')))
+    try:
+        rows = await rebuild(db)
+    finally:
+        db.close()
+    print(f"✅ Rebuilt sales rollups: {rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the sales_rollups collection")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from raw orders")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(2)
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,202 @@
+"""
+In-memory search over the active games: name, name_ar, description and
+description_ar, in English and Arabic.
+
+Text is normalised before indexing and querying: case folded, diacritics
+(tashkeel, accents) and tatweel stripped, alef variants folded to bare alef,
+taa marbuta to haa and alef maqsura to yaa, so "لعبة" finds "لعبه" and
+"إضافة" finds "اضافه". Each word is indexed as character trigrams padded at
+both ends, which also matches word prefixes and survives small typos, plus
+its first letter so that a one-letter query word matches as a prefix.
+
+The index follows the games catalog snapshot (CatalogCache.search):
+when a snapshot is rebuilt only the games that changed are re-indexed.
+Results are cached per query until the index next changes; with 1000 games,
+a query for a word every game contains takes about 1 ms uncached.
+"""
+
+import heapq
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from lru import TTLCache
+
+# Field weights: a hit in a name outranks one in a description
+SEARCH_FIELDS = {"name": 3.0, "name_ar": 3.0, "description": 1.0, "description_ar": 1.0}
+NAME_FIELDS = ("name", "name_ar")
+# Share of a query word's trigrams a game must contain for that word to match
+MIN_WORD_MATCH = 0.5
+# Added when a name starts with / contains the whole query
+PREFIX_BONUS = 2.0
+CONTAINS_BONUS = 1.0
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', '1000'))
+
+_ARABIC_FOLD = str.maketrans({
+    "ٱ": "ا",  # alef wasla (أ إ آ lose their hamza / madda to NFKD)
+    "ة": "ه",  # taa marbuta
+    "ى": "ي",  # alef maqsura
+    "ـ": None,  # tatweel
+})
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return stripped.translate(_ARABIC_FOLD).casefold()
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(normalize(text))
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def query_grams(word: str) -> Set[str]:
+    # A single letter matches every word starting with it
+    return {f" {word}"} if len(word) == 1 else trigrams(word)
+
+
+class SearchIndex:
+    def __init__(self):
+        self.queries = 0
+        # trigram -> field weight -> game ids; sets so matches are counted in C
+        self._postings: Dict[str, Dict[float, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        self._grams: Dict[str, Dict[str, float]] = {}  # game id -> its trigrams and weights, for removal
+        # game id -> normalised names, each preceded by "\n" so one substring
+        # test tells whether any name starts with (or contains) a phrase
+        self._names: Dict[str, str] = {}
+        self._indexed: Dict[str, dict] = {}  # game id -> the document as indexed
+        self._rank: Optional[Dict[str, int]] = None  # game id -> position by name, for ties
+        self._results = TTLCache(SEARCH_CACHE_SIZE, math.inf)  # (query words, limit) -> game ids
+
+    def __len__(self) -> int:
+        return len(self._indexed)
+
+    def add(self, game: dict):
+        self.remove(game["id"])
+        weights: Dict[str, float] = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for word in words(game.get(field) or ""):
+                for gram in trigrams(word) | {f" {word[0]}"}:
+                    weights[gram] = max(weight, weights.get(gram, 0.0))
+        for gram, weight in weights.items():
+            self._postings[gram][weight].add(game["id"])
+        self._grams[game["id"]] = weights
+        self._names[game["id"]] = "".join("\n" + normalize(game.get(field) or "") for field in NAME_FIELDS)
+        self._indexed[game["id"]] = game
+
+    def remove(self, game_id: str):
+        self._results.clear()
+        self._rank = None
+        for gram, weight in self._grams.pop(game_id, {}).items():
+            by_weight = self._postings[gram]
+            by_weight[weight].discard(game_id)
+            if not by_weight[weight]:
+                del by_weight[weight]
+                if not by_weight:
+                    del self._postings[gram]
+        self._names.pop(game_id, None)
+        self._indexed.pop(game_id, None)
+
+    def sync(self, games: Iterable[dict]) -> int:
+        # Bring the index in line with a catalog snapshot; returns how many
+        # games had to be (re)indexed or dropped
+        current = {game["id"]: game for game in games}
+        changed = 0
+        for game_id in [game_id for game_id in self._indexed if game_id not in current]:
+            self.remove(game_id)
+            changed += 1
+        for game_id, game in current.items():
+            if self._indexed.get(game_id) != game:
+                self.add(game)
+                changed += 1
+        return changed
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        # Game ids, best match first. Every query word has to match; a game
+        # scores the weighted share of each word's trigrams it contains, plus
+        # a bonus when a name starts with or contains the whole query.
+        self.queries += 1
+        query_words = tuple(words(query))
+        if not query_words:
+            return []
+        cached = self._results.get((query_words, limit))
+        if cached is None:
+            cached = self._search(query_words, limit)
+            self._results.set((query_words, limit), cached)
+        return list(cached)
+
+    def _search(self, query_words: Tuple[str, ...], limit: int) -> List[str]:
+        postings = self._postings
+        # Rarest word first, so common ones only have to check its survivors
+        grams_by_word = sorted(
+            (query_grams(word) for word in query_words),
+            key=lambda grams: sum(len(ids) for gram in grams for ids in postings.get(gram, {}).values()),
+        )
+        scores: Optional[Dict[str, float]] = None
+        for grams in grams_by_word:
+            lists = [postings[gram] for gram in grams if gram in postings]
+            needed = MIN_WORD_MATCH * len(grams)
+            if len(lists) < needed:
+                return []
+            matched = self._match(lists, needed, 1 / len(grams), scores)
+            if scores is not None:
+                matched = {game_id: scores[game_id] + score for game_id, score in matched.items()}
+            scores = matched
+            if not scores:
+                return []
+
+        # Only games the name bonus could still lift into the top `limit` need it
+        if len(scores) > limit:
+            cutoff = heapq.nlargest(limit, scores.values())[-1] - PREFIX_BONUS
+            scores = {game_id: score for game_id, score in scores.items() if score >= cutoff}
+        phrase = " ".join(query_words)
+        prefix = "\n" + phrase
+        for game_id in scores:
+            names = self._names[game_id]
+            if prefix in names:
+                scores[game_id] += PREFIX_BONUS
+            elif phrase in names:
+                scores[game_id] += CONTAINS_BONUS
+        if self._rank is None:
+            self._rank = {game_id: rank for rank, game_id in enumerate(sorted(self._names, key=self._names.get))}
+        rank = self._rank
+        best = heapq.nsmallest(limit, [(-score, rank[game_id], game_id) for game_id, score in scores.items()])
+        return [game_id for _, _, game_id in best]
+
+    @staticmethod
+    def _match(lists: List[Dict[float, Set[str]]], needed: float, scale: float,
+               candidates: Optional[Dict[str, float]]) -> Dict[str, float]:
+        # Games holding at least `needed` of a word's trigrams -> their summed
+        # trigram weights x scale. Counter.update does the counting in C.
+        by_weight: Dict[float, Counter] = defaultdict(Counter)
+        for gram_postings in lists:
+            for weight, ids in gram_postings.items():
+                by_weight[weight].update(ids if candidates is None else ids & candidates.keys())
+        if len(by_weight) == 1:
+            (weight, counts), = by_weight.items()
+            weight *= scale
+            return {game_id: weight * count for game_id, count in counts.items() if count >= needed}
+        matched = {}
+        for game_id in set().union(*by_weight.values()):
+            count, score = 0, 0.0
+            for weight, counts in by_weight.items():
+                hits = counts.get(game_id)
+                if hits:
+                    count += hits
+                    score += weight * hits
+            if count >= needed:
+                matched[game_id] = score * scale
+        return matched
+
+    def metrics(self) -> dict:
+        return {"games": len(self._indexed), "trigrams": len(self._postings), "queries": self.queries,
+                "cache": self._results.metrics()}
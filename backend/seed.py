@@ -0,0 +1,173 @@
+"""
+Seed data for a fresh gaming_store database: the default admin account and a
+few sample games, news items and banners. Collections that already have
+documents are left alone, so seeding is safe to repeat.
+
+The server seeds on startup unless SEED_SAMPLE_DATA=false; in production turn
+that off and run this once per environment instead:
+
+    python seed.py [--no-sample-data]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import uuid
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from locks import mongo_lock
+from repositories import Database
+
+SEED_SAMPLE_DATA = os.environ.get('SEED_SAMPLE_DATA', 'true').lower() == 'true'
+
+
+async def ensure_admin(db: Database) -> dict:
+    existing_admin = await db.admins.get({"username": "admin"})
+    if not existing_admin:
+        admin_data = {
+            "id": str(uuid.uuid4()),
+            "username": "admin",
+            "password": hashlib.sha256("xliunx".encode()).hexdigest(),
+            "created_at": datetime.now().isoformat()
+        }
+        await db.admins.insert(admin_data)
+        print("Admin user created")
+        existing_admin = admin_data
+    return existing_admin
+
+
+async def seed_sample_data(db: Database):
+    # Check if games already exist
+    if await db.games.count() == 0:
+        sample_games = [
+            {
+                "id": str(uuid.uuid4()),
+                "name": "TikTok Coins",
+                "name_ar": "عملات تيك توك",
+                "description": "Buy TikTok coins to support your favorite creators",
+                "description_ar": "اشتري عملات تيك توك لدعم المبدعين المفضلين لديك",
+                "image_url": "https://images.unsplash.com/photo-1645109870868-e1b6f909e444?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDk1Nzh8MHwxfHNlYXJjaHwyfHxtb2JpbGUlMjBnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzI4fDA&ixlib=rb-4.1.0&q=85",
+                "prices": [
+                    {"amount": "70 عملة", "quantity": 70, "price": 5, "currency": "ريال"},
+                    {"amount": "350 عملة", "quantity": 350, "price": 20, "currency": "ريال"},
+                    {"amount": "700 عملة", "quantity": 700, "price": 35, "currency": "ريال"},
+                    {"amount": "1400 عملة", "quantity": 1400, "price": 70, "currency": "ريال"}
+                ],
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            },
+            {
+                "id": str(uuid.uuid4()),
+                "name": "PUBG Mobile UC",
+                "name_ar": "يوسي ببجي موبايل",
+                "description": "Get Unknown Cash for PUBG Mobile to buy skins and battle passes",
+                "description_ar": "احصل على اليوسي لببجي موبايل لشراء الأسلحة والبطاقات الموسمية",
+                "image_url": "https://images.unsplash.com/photo-1564049489314-60d154ff107d?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDk1Nzh8MHwxfHNlYXJjaHwxfHxtb2JpbGUlMjBnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzI4fDA&ixlib=rb-4.1.0&q=85",
+                "prices": [
+                    {"amount": "60 يوسي", "quantity": 60, "price": 5, "currency": "ريال"},
+                    {"amount": "325 يوسي", "quantity": 325, "price": 25, "currency": "ريال"},
+                    {"amount": "660 يوسي", "quantity": 660, "price": 50, "currency": "ريال"},
+                    {"amount": "1800 يوسي", "quantity": 1800, "price": 100, "currency": "ريال"}
+                ],
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            }
+        ]
+        await db.games.insert_many(sample_games)
+    
+    # Sample news
+    if await db.news.count() == 0:
+        sample_news = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Welcome to Gaming Store 2025",
+                "title_ar": "مرحباً بكم في متجر الألعاب 2025",
+                "content": "Get the best gaming top-ups at amazing prices!",
+                "content_ar": "احصل على أفضل شحنات الألعاب بأسعار مذهلة!",
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            },
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Fast Delivery Guaranteed",
+                "title_ar": "توصيل سريع مضمون",
+                "content": "All orders processed within 5 minutes!",
+                "content_ar": "جميع الطلبات تتم معالجتها خلال 5 دقائق!",
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            },
+            {
+                "id": str(uuid.uuid4()),
+                "title": "24/7 Customer Support",
+                "title_ar": "دعم عملاء على مدار الساعة",
+                "content": "We're here to help you anytime!",
+                "content_ar": "نحن هنا لمساعدتك في أي وقت!",
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            }
+        ]
+        await db.news.insert_many(sample_news)
+    
+    # Sample banners
+    if await db.banners.count() == 0:
+        sample_banners = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Gaming Excellence",
+                "title_ar": "تميز الألعاب",
+                "image_url": "https://images.unsplash.com/photo-1542751371-adc38448a05e?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDQ2Mzl8MHwxfHNlYXJjaHwxfHxnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzIxfDA&ixlib=rb-4.1.0&q=85",
+                "link": "#games",
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            },
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Mobile Gaming Pro",
+                "title_ar": "ألعاب الجوال المحترفة",
+                "image_url": "https://images.unsplash.com/photo-1593305841991-05c297ba4575?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDQ2Mzl8MHwxfHNlYXJjaHwzfHxnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzIxfDA&ixlib=rb-4.1.0&q=85",
+                "link": "#games",
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            },
+            {
+                "id": str(uuid.uuid4()),
+                "title": "Ultimate Gaming Experience",
+                "title_ar": "تجربة ألعاب لا تُنسى",
+                "image_url": "https://images.unsplash.com/photo-1626686707291-7bda5c45e8a8?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDk1Nzh8MHwxfHNlYXJjaHwzfHxtb2JpbGUlMjBnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzI4fDA&ixlib=rb-4.1.0&q=85",
+                "link": "#games",
+                "is_active": True,
+                "created_at": datetime.now().isoformat()
+            }
+        ]
+        await db.banners.insert_many(sample_banners)
+
+
+async def seed(db: Database, sample_data: bool = SEED_SAMPLE_DATA) -> dict:
+    # Workers booting together would otherwise all see empty collections and
+    # insert the samples (and the admin) several times over.
+    async with mongo_lock(db, "seed"):
+        admin = await ensure_admin(db)
+        if sample_data:
+            await seed_sample_data(db)
+    return admin
+
+
+async def _main(sample_data: bool) -> int:
+    db = Database(AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017')))
+    try:
+        await seed(db, sample_data)
+    finally:
+        db.close()
+    print("✅ Seeding complete")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the admin account and sample catalog")
+    parser.add_argument("--no-sample-data", action="store_true", help="only create the admin account")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(not args.no_sample_data)))
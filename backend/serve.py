@@ -0,0 +1,145 @@
+"""
+Production entry point: a small supervisor running several uvicorn workers on
+one shared listening socket.
+
+Workers are started with the spawn method, so each one imports the app from
+scratch and builds its own Motor client in the lifespan; nothing created by
+pymongo in the parent ever crosses a fork. A worker that exits unexpectedly
+is replaced, with exponential backoff if it keeps crashing. SIGTERM/SIGINT
+stop the workers gracefully (in-flight requests finish, the order journal
+flushes) and the supervisor exits once they are gone.
+
+    WEB_CONCURRENCY=4 python serve.py
+
+Each worker keeps its own Mongo pool, so the connections a deployment opens
+are up to WEB_CONCURRENCY x MONGO_MAX_POOL_SIZE (see repositories.py).
+
+Behind an ingress or load balancer, set FORWARDED_ALLOW_IPS to its address(es)
+(comma separated, or "*" if nothing else can reach the port). Only then is
+X-Forwarded-For trusted, and rate limits (ratelimit.py) apply per customer
+instead of to everyone coming through the proxy.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict, List
+
+import uvicorn
+
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', '8001'))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+# Peers whose X-Forwarded-For / X-Forwarded-Proto headers are believed
+FORWARDED_ALLOW_IPS = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+# Seconds uvicorn waits for in-flight requests to finish on shutdown
+WORKER_SHUTDOWN_TIMEOUT = float(os.environ.get('WORKER_SHUTDOWN_TIMEOUT', '30'))
+# Extra time after that for the lifespan shutdown (final order journal flush,
+# stopping the event poller) before the supervisor kills the worker
+WORKER_SHUTDOWN_MARGIN = float(os.environ.get('WORKER_SHUTDOWN_MARGIN', '15'))
+# A worker that lived this long is considered healthy again; its next crash
+# is restarted immediately instead of after the accumulated backoff
+WORKER_STABLE_AFTER = 60.0
+WORKER_MAX_BACKOFF = 30.0
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class Server(uvicorn.Server):
+    async def shutdown(self, sockets=None):
+        # uvicorn waits for open connections before the lifespan shutdown;
+        # catalog event streams would otherwise hold it for the full timeout
+        from server import app
+        events = getattr(app.state, "events", None)
+        if events:
+            events.close_streams()
+        await super().shutdown(sockets)
+
+
+def _run_worker(config: uvicorn.Config, sockets):
+    config.configure_logging()
+    Server(config).run(sockets=sockets)
+
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.sockets = []
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.backoff: List[float] = [0.0] * workers
+        self.should_exit = threading.Event()
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, slot: int):
+        process = self._context.Process(target=_run_worker, args=(self.config, self.sockets),
+                                        name=f"worker-{slot}")
+        process.start()
+        self.processes[slot] = process
+        self.started_at[slot] = time.monotonic()
+        logger.info(f"Started worker {slot} [{process.pid}]")
+
+    def _handle_signal(self, signum, frame):
+        self.should_exit.set()
+
+    def _restart_failed(self):
+        for slot, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            lived = time.monotonic() - self.started_at[slot]
+            if lived >= WORKER_STABLE_AFTER:
+                self.backoff[slot] = 0.0
+            logger.warning(f"Worker {slot} [{process.pid}] exited with code {process.exitcode} "
+                           f"after {lived:.1f}s; restarting in {self.backoff[slot]:.1f}s")
+            if self.should_exit.wait(self.backoff[slot]):
+                return
+            self.backoff[slot] = min(max(self.backoff[slot] * 2, 1.0), WORKER_MAX_BACKOFF)
+            self._spawn(slot)
+
+    def _shutdown(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: uvicorn finishes requests, then runs the lifespan exit
+        deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT + WORKER_SHUTDOWN_MARGIN
+        for slot, process in self.processes.items():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"Worker {slot} [{process.pid}] did not stop in time; killing it")
+                process.kill()
+                process.join()
+
+    def run(self):
+        self.config.configure_logging()
+        self.sockets = [self.config.bind_socket()]
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self._handle_signal)
+
+        logger.info(f"Supervisor [{os.getpid()}] starting {self.workers} worker(s) on {self.config.host}:{self.config.port}")
+        for slot in range(self.workers):
+            self._spawn(slot)
+        while not self.should_exit.wait(0.5):
+            self._restart_failed()
+        self._shutdown()
+        logger.info(f"Supervisor [{os.getpid()}] stopped")
+
+
+def build_config() -> uvicorn.Config:
+    return uvicorn.Config("server:app", host=HOST, port=PORT, proxy_headers=True,
+                          forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+                          timeout_graceful_shutdown=int(WORKER_SHUTDOWN_TIMEOUT))
+
+
+def main():
+    config = build_config()
+    if WEB_CONCURRENCY <= 1:
+        Server(config).run()
+    else:
+        Supervisor(config, WEB_CONCURRENCY).run()
+
+
+if __name__ == "__main__":
+    main()
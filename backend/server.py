@@ -1,27 +1,189 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import math
 import os
-from pymongo import MongoClient
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import hashlib
+import base64
+import csv
+import io
+import json
 import jwt
 import bcrypt
-from passlib.context import CryptContext
 
-app = FastAPI()
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from repositories import Database, Repository, client_options
+from catalog import CatalogCache
+from images import IMAGE_FORMATS, ImageCache, ImageUnavailable, default_fetcher, snap_width
+from events import CatalogEvents
+from bulk import BulkRequest, apply_bulk
+from compression import COMPRESS_MIN_SIZE, CompressionMiddleware, EncodedBody, negotiate
+from indexes import ensure_indexes
+from passwords import PasswordHasher, PasswordPoolSaturated
+from ratelimit import RateLimited, RateLimiter
+from idempotency import (IDEMPOTENCY_KEY_MAX_LENGTH, IdempotencyInProgress, IdempotencyMismatch,
+                         IdempotencyStore, fingerprint)
+from lru import TTLCache
+from order_queue import OrderQueue
+import rollups
+from pricing import PricePackage, format_price, parse_price
+from locks import mongo_lock
+from seed import seed
 
 # JWT settings
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24  # 30 days
 
+# Authenticated-user caches: decoded tokens (token -> user_id) and the profile
+# projection returned by get_current_user (user_id -> user). Short TTL; writes
+# to a user document must call invalidate_user().
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', '30'))
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '10000'))
+token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+user_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
+
+# Admin sessions are signed JWTs checked in memory. The token carries a
+# fingerprint of the admin's password hash, compared against a cached admin
+# record, so changing the password revokes every token issued before it.
+# The worker that handles the change drops its cached record at once; other
+# workers keep theirs for up to ADMIN_CACHE_TTL seconds, so old tokens still
+# work there for that long. The record is one indexed read, hence the short TTL.
+ADMIN_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ADMIN_TOKEN_EXPIRE_MINUTES', str(12 * 60)))
+ADMIN_CACHE_TTL = float(os.environ.get('ADMIN_CACHE_TTL', '5'))
+admin_cache = TTLCache(16, ADMIN_CACHE_TTL)
+
+def password_fingerprint(stored_password: str) -> str:
+    return hashlib.sha256(f"{SECRET_KEY}:{stored_password}".encode()).hexdigest()[:16]
+
+async def get_admin_record(db: Database, admin_id: str) -> Optional[dict]:
+    admin = admin_cache.get(admin_id)
+    if admin is None:
+        admin = await db.admins.get({"id": admin_id})
+        if admin:
+            admin_cache.set(admin_id, admin)
+    return admin
+
+# MongoDB connection
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+ENSURE_INDEXES = os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() == 'true'
+# Journal orders locally and write them to Mongo in batches (see order_queue.py)
+ORDER_WRITE_BEHIND = os.environ.get('ORDER_WRITE_BEHIND', 'true').lower() == 'true'
+
+# How long readiness waits for a Mongo ping before reporting not ready
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', '2'))
+# Startup steps that fail (Mongo unreachable, ...) are retried after this many
+# seconds, doubling up to STARTUP_MAX_RETRY_DELAY
+STARTUP_RETRY_DELAY = 1.0
+STARTUP_MAX_RETRY_DELAY = 30.0
+
+async def bootstrap(app: FastAPI):
+    # Everything that needs Mongo runs here, in the background, so the worker
+    # answers health probes meanwhile: readiness reports "starting" until
+    # every step has completed. A failed step is retried; completed steps
+    # are not run again.
+    db = app.state.db
+    started = time.perf_counter()
+    phases = {}
+
+    async def build_indexes():
+        async with mongo_lock(db, "indexes", lease=300):
+            for problem in await ensure_indexes(db):
+                print(f"Index check: {problem}")
+
+    async def seed_data():
+        admin = await seed(db)
+        # Warm the cache so admin requests never have to read the admins collection
+        admin_cache.set(admin["id"], admin)
+
+    async def start_order_queue():
+        # Replays orders journaled (and acknowledged) by a previous run
+        order_queue = OrderQueue(
+            db.orders.collection,
+            on_inserted=lambda orders: rollups.record_orders(db, orders),
+        )
+        await order_queue.start()
+        app.state.order_queue = order_queue
+
+    steps = [("indexes", build_indexes)] if ENSURE_INDEXES else []
+    steps += [("seed", seed_data), ("events", app.state.events.start)]
+    if ORDER_WRITE_BEHIND:
+        steps.append(("order_queue", start_order_queue))
+
+    for name, step in steps:
+        delay = STARTUP_RETRY_DELAY
+        while True:
+            mark = time.perf_counter()
+            try:
+                await step()
+                break
+            except Exception as exc:
+                app.state.startup_error = f"{name}: {exc}"
+                print(f"Startup step {name} failed, retrying in {delay:.0f}s: {exc}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STARTUP_MAX_RETRY_DELAY)
+        phases[name] = round(time.perf_counter() - mark, 3)
+
+    app.state.startup = {
+        "seconds": round(time.perf_counter() - started, 3),
+        "phases": phases,
+        "completed_at": datetime.now().isoformat(),
+    }
+    app.state.startup_error = None
+    print(f"Startup complete in {app.state.startup['seconds']}s {phases}")
+    app.state.ready = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The Motor client is bound to the running event loop, so it is created here
+    # rather than at import time and closed when the app shuts down. Under
+    # serve.py this runs once in every worker, giving each its own pool.
+    app.state.ready = False
+    app.state.startup = None
+    app.state.startup_error = None
+    app.state.limiter = RateLimiter()
+    db = Database(AsyncIOMotorClient(MONGO_URL, **client_options()))
+    app.state.db = db
+    app.state.catalog = CatalogCache(db)
+    app.state.idempotency = IdempotencyStore(db.idempotency_keys.collection)
+    passwords = PasswordHasher()
+    passwords.start()
+    app.state.passwords = passwords
+    images = ImageCache(default_fetcher())
+    images.start()
+    app.state.images = images
+    app.state.events = CatalogEvents(db, app.state.catalog)
+    # Until the journal is replayed, orders are inserted directly
+    app.state.order_queue = None
+    startup = asyncio.create_task(bootstrap(app))
+    yield
+    startup.cancel()
+    try:
+        await startup
+    except asyncio.CancelledError:
+        pass
+    await app.state.events.stop()
+    await app.state.idempotency.stop()
+    if app.state.order_queue:
+        await app.state.order_queue.stop()
+    await images.stop()
+    passwords.shutdown()
+    db.close()
+
+# orjson for every response model / dict a route returns
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,28 +193,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB connection
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = MongoClient(MONGO_URL)
-db = client.gaming_store
+# gzip/br for dynamic responses; catalog routes serve their own cached variants
+app.add_middleware(CompressionMiddleware)
+
+def get_db(request: Request) -> Database:
+    return request.app.state.db
 
-# Collections
-games_collection = db.games
-news_collection = db.news
-banners_collection = db.banners
-orders_collection = db.orders
-admins_collection = db.admins
-users_collection = db.users
+def get_catalog(request: Request) -> CatalogCache:
+    return request.app.state.catalog
+
+def get_images(request: Request) -> ImageCache:
+    return request.app.state.images
+
+def get_events(request: Request) -> CatalogEvents:
+    return request.app.state.events
+
+async def publish_changes(events: CatalogEvents, entity: str, changes: List[tuple]):
+    # Runs after the write has committed, so a failure here must not become
+    # a 500 (a retried create would insert a duplicate). Other workers still
+    # pick the change up once their catalog cache TTL runs out.
+    try:
+        await events.publish_many(entity, changes)
+    except Exception as exc:
+        print(f"Catalog events: publishing {entity} {changes} failed: {exc}")
+
+# HTTP caching for public catalog routes. Browsers and CDNs may reuse a body
+# for max-age seconds, after which they revalidate with If-None-Match.
+CATALOG_CACHE_CONTROL = os.environ.get('CATALOG_CACHE_CONTROL', 'public, max-age=30, must-revalidate')
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+async def catalog_response(request: Request, body: EncodedBody, etag: str) -> Response:
+    # Catalog bodies come pre-encoded (and pre-compressed) from CatalogCache,
+    # so they bypass the response model, the encoder and CompressionMiddleware.
+    encoding = negotiate(request.headers.get("accept-encoding")) if len(body) >= COMPRESS_MIN_SIZE else None
+    if encoding:
+        # Each content-coding is a different representation with its own tag
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=await body.variant(encoding), media_type="application/json", headers=headers)
 
 # Security
 security = HTTPBearer(auto_error=False)
 
-# Password hashing utilities
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# Password hashing runs in a bounded process pool (see passwords.py)
+def get_passwords(request: Request) -> PasswordHasher:
+    return request.app.state.passwords
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+@app.exception_handler(PasswordPoolSaturated)
+async def password_pool_saturated_handler(request: Request, exc: PasswordPoolSaturated):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please try again"},
+        headers={"Retry-After": "1"},
+    )
+
+def get_idempotency(request: Request) -> IdempotencyStore:
+    return request.app.state.idempotency
+
+def get_limiter(request: Request) -> RateLimiter:
+    return request.app.state.limiter
+
+def client_ip(request: Request) -> Optional[str]:
+    # The peer address, or X-Forwarded-For when the peer is a proxy listed in
+    # FORWARDED_ALLOW_IPS (see serve.py); otherwise every client behind an
+    # untrusted proxy shares the proxy's address and its rate limit buckets
+    return request.client.host if request.client else None
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, please try again later"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
 
 # JWT utilities
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -66,30 +290,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str):
+    user_id = token_cache.get(token)
+    if user_id:
+        return user_id
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+        # Never keep a token cached past its own expiry
+        token_cache.set(token, user_id, ttl=payload["exp"] - time.time())
         return user_id
     except jwt.PyJWTError:
         return None
 
-# Initialize admin user
-def init_admin():
-    existing_admin = admins_collection.find_one({"username": "admin"})
-    if not existing_admin:
-        admin_data = {
-            "id": str(uuid.uuid4()),
-            "username": "admin",
-            "password": hashlib.sha256("xliunx".encode()).hexdigest(),
-            "created_at": datetime.now().isoformat()
-        }
-        admins_collection.insert_one(admin_data)
-        print("Admin user created")
-
-init_admin()
-
 # Models
 class Game(BaseModel):
     name: str
@@ -97,7 +311,7 @@ class Game(BaseModel):
     description: str
     description_ar: str
     image_url: str
-    prices: List[dict]  # [{"amount": "100", "price": "5", "currency": "ريال"}]
+    prices: List[PricePackage]  # [{"amount": "70 عملة", "quantity": 70, "price": 5, "currency": "ريال"}]
     is_active: bool = True
 
 class NewsItem(BaseModel):
@@ -114,12 +328,36 @@ class Banner(BaseModel):
     link: Optional[str] = None
     is_active: bool = True
 
+# Partial updates for PATCH: only the fields the client sends are written
+class GamePatch(BaseModel):
+    name: Optional[str] = None
+    name_ar: Optional[str] = None
+    description: Optional[str] = None
+    description_ar: Optional[str] = None
+    image_url: Optional[str] = None
+    prices: Optional[List[PricePackage]] = None
+    is_active: Optional[bool] = None
+
+class NewsPatch(BaseModel):
+    title: Optional[str] = None
+    title_ar: Optional[str] = None
+    content: Optional[str] = None
+    content_ar: Optional[str] = None
+    is_active: Optional[bool] = None
+
+class BannerPatch(BaseModel):
+    title: Optional[str] = None
+    title_ar: Optional[str] = None
+    image_url: Optional[str] = None
+    link: Optional[str] = None
+    is_active: Optional[bool] = None
+
 class Order(BaseModel):
     game_id: str
     game_name: str
     player_id: str
     amount: str
-    price: str
+    price: float
     currency: str
     customer_name: str
     customer_phone: str
@@ -129,6 +367,10 @@ class AdminLogin(BaseModel):
     username: str
     password: str
 
+class AdminPasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
 class UserRegister(BaseModel):
     username: str
     email: EmailStr
@@ -152,22 +394,33 @@ class Token(BaseModel):
     username: str
 
 # Admin authentication
-def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security),
+                       db: Database = Depends(get_db)):
     if not credentials:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    # Simple token validation (in production, use proper JWT)
-    token = credentials.credentials
-    admin = admins_collection.find_one({"username": "admin"})
-    expected_token = hashlib.sha256(f"admin:xliunx".encode()).hexdigest()
+    try:
+        claims = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid authentication")
+    if claims.get("role") != "admin":
+        raise HTTPException(status_code=401, detail="Invalid authentication")
     
-    if token != expected_token:
+    admin = await get_admin_record(db, claims.get("sub"))
+    if not admin or claims.get("pwv") != password_fingerprint(admin["password"]):
         raise HTTPException(status_code=401, detail="Invalid authentication")
     
     return admin
 
+def create_admin_token(admin: dict) -> str:
+    return create_access_token(
+        data={"sub": admin["id"], "role": "admin", "pwv": password_fingerprint(admin["password"])},
+        expires_delta=timedelta(minutes=ADMIN_TOKEN_EXPIRE_MINUTES),
+    )
+
 # User authentication
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security),
+                           db: Database = Depends(get_db)):
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -183,180 +436,264 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = users_collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.get({"id": user_id}, {"_id": 0, "password": 0})
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user_cache.set(user_id, user)
     
     return user
 
-# Initialize sample data
-def init_sample_data():
-    # Check if games already exist
-    if games_collection.count_documents({}) == 0:
-        sample_games = [
-            {
-                "id": str(uuid.uuid4()),
-                "name": "TikTok Coins",
-                "name_ar": "عملات تيك توك",
-                "description": "Buy TikTok coins to support your favorite creators",
-                "description_ar": "اشتري عملات تيك توك لدعم المبدعين المفضلين لديك",
-                "image_url": "https://images.unsplash.com/photo-1645109870868-e1b6f909e444?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDk1Nzh8MHwxfHNlYXJjaHwyfHxtb2JpbGUlMjBnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzI4fDA&ixlib=rb-4.1.0&q=85",
-                "prices": [
-                    {"amount": "70 عملة", "price": "5", "currency": "ريال"},
-                    {"amount": "350 عملة", "price": "20", "currency": "ريال"},
-                    {"amount": "700 عملة", "price": "35", "currency": "ريال"},
-                    {"amount": "1400 عملة", "price": "70", "currency": "ريال"}
-                ],
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "name": "PUBG Mobile UC",
-                "name_ar": "يوسي ببجي موبايل",
-                "description": "Get Unknown Cash for PUBG Mobile to buy skins and battle passes",
-                "description_ar": "احصل على اليوسي لببجي موبايل لشراء الأسلحة والبطاقات الموسمية",
-                "image_url": "https://images.unsplash.com/photo-1564049489314-60d154ff107d?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDk1Nzh8MHwxfHNlYXJjaHwxfHxtb2JpbGUlMjBnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzI4fDA&ixlib=rb-4.1.0&q=85",
-                "prices": [
-                    {"amount": "60 يوسي", "price": "5", "currency": "ريال"},
-                    {"amount": "325 يوسي", "price": "25", "currency": "ريال"},
-                    {"amount": "660 يوسي", "price": "50", "currency": "ريال"},
-                    {"amount": "1800 يوسي", "price": "100", "currency": "ريال"}
-                ],
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            }
-        ]
-        games_collection.insert_many(sample_games)
-    
-    # Sample news
-    if news_collection.count_documents({}) == 0:
-        sample_news = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Welcome to Gaming Store 2025",
-                "title_ar": "مرحباً بكم في متجر الألعاب 2025",
-                "content": "Get the best gaming top-ups at amazing prices!",
-                "content_ar": "احصل على أفضل شحنات الألعاب بأسعار مذهلة!",
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Fast Delivery Guaranteed",
-                "title_ar": "توصيل سريع مضمون",
-                "content": "All orders processed within 5 minutes!",
-                "content_ar": "جميع الطلبات تتم معالجتها خلال 5 دقائق!",
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "24/7 Customer Support",
-                "title_ar": "دعم عملاء على مدار الساعة",
-                "content": "We're here to help you anytime!",
-                "content_ar": "نحن هنا لمساعدتك في أي وقت!",
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            }
-        ]
-        news_collection.insert_many(sample_news)
-    
-    # Sample banners
-    if banners_collection.count_documents({}) == 0:
-        sample_banners = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Gaming Excellence",
-                "title_ar": "تميز الألعاب",
-                "image_url": "https://images.unsplash.com/photo-1542751371-adc38448a05e?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDQ2Mzl8MHwxfHNlYXJjaHwxfHxnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzIxfDA&ixlib=rb-4.1.0&q=85",
-                "link": "#games",
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Mobile Gaming Pro",
-                "title_ar": "ألعاب الجوال المحترفة",
-                "image_url": "https://images.unsplash.com/photo-1593305841991-05c297ba4575?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDQ2Mzl8MHwxfHNlYXJjaHwzfHxnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzIxfDA&ixlib=rb-4.1.0&q=85",
-                "link": "#games",
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Ultimate Gaming Experience",
-                "title_ar": "تجربة ألعاب لا تُنسى",
-                "image_url": "https://images.unsplash.com/photo-1626686707291-7bda5c45e8a8?crop=entropy&cs=srgb&fm=jpg&ixid=M3w3NDk1Nzh8MHwxfHNlYXJjaHwzfHxtb2JpbGUlMjBnYW1pbmd8ZW58MHx8fHwxNzU0MTU2MzI4fDA&ixlib=rb-4.1.0&q=85",
-                "link": "#games",
-                "is_active": True,
-                "created_at": datetime.now().isoformat()
-            }
-        ]
-        banners_collection.insert_many(sample_banners)
-
-init_sample_data()
+# Checkout works with or without an account; a valid token only links the order
+def get_optional_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Optional[str]:
+    if not credentials:
+        return None
+    return verify_token(credentials.credentials)
+
+# Opaque keyset cursors for order listings: base64 of [created_at, id]
+def encode_cursor(order: dict) -> str:
+    raw = json.dumps([order["created_at"], order["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, order_id = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(order_id, str):
+            raise ValueError
+        return created_at, order_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Optimistic concurrency for catalog edits. Every document carries an integer
+# version, bumped by each write and sent as the ETag "N"; writes that name a
+# version in If-Match only apply if the document is still at it.
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    # None for "*" (any version); weak tags are accepted as well
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not name a version")
+
+def patch_fields(patch: BaseModel, model: type) -> dict:
+    # Null is only allowed where the full model allows it
+    fields = patch.dict(exclude_unset=True)
+    if not fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    for name, value in fields.items():
+        if value is None and model.model_fields[name].default is not None:
+            raise HTTPException(status_code=422, detail=f"{name} cannot be null")
+    return fields
+
+async def save_catalog_item(repo: Repository, item_id: str, fields: dict, if_match: Optional[str],
+                            response: Response, not_found: str) -> int:
+    expected = parse_if_match(if_match)
+    version = await repo.update_versioned(item_id, {**fields, "updated_at": datetime.now().isoformat()}, expected)
+    if version is None:
+        if expected is None or not await repo.get_by_id(item_id):
+            raise HTTPException(status_code=404, detail=not_found)
+        raise HTTPException(status_code=412, detail="Version mismatch")
+    response.headers["ETag"] = f'"{version}"'
+    return version
+
+def require_if_match(if_match: Optional[str] = Header(None)) -> str:
+    # PATCH is never unconditional: without If-Match a stale form could win silently
+    if if_match is None:
+        raise HTTPException(status_code=428, detail="If-Match header required")
+    return if_match
 
 # API Routes
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Gaming Store 2025 API"}
 
+# Health probes. Liveness only says the process is serving requests; readiness
+# also requires a finished startup and a reachable Mongo.
+@app.get("/api/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+@app.get("/api/health/ready")
+async def health_ready(request: Request):
+    if not request.app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting",
+                                                      "detail": request.app.state.startup_error})
+    try:
+        await asyncio.wait_for(request.app.state.db.client.admin.command("ping"), READINESS_TIMEOUT)
+    except Exception as exc:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(exc)})
+    return {"status": "ready", "startup": request.app.state.startup}
+
 # Public routes
+@app.get("/api/storefront")
+async def get_storefront(request: Request, catalog: CatalogCache = Depends(get_catalog)):
+    # Everything the home page needs in a single round trip
+    body, etag = await catalog.storefront()
+    return await catalog_response(request, body, etag)
+
 @app.get("/api/games")
-def get_games():
-    games = list(games_collection.find({"is_active": True}, {"_id": 0}))
-    return {"games": games}
+async def get_games(request: Request, catalog: CatalogCache = Depends(get_catalog)):
+    entry = await catalog.load("games")
+    return await catalog_response(request, entry.body, entry.etag)
+
+# Declared before /api/games/{game_id} so "search" is not taken for an id
+@app.get("/api/games/search")
+async def search_games(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(20, ge=1, le=50),
+                       catalog: CatalogCache = Depends(get_catalog)):
+    return {"query": q, "games": await catalog.search(q, limit)}
 
 @app.get("/api/games/{game_id}")
-def get_game(game_id: str):
-    game = games_collection.find_one({"id": game_id, "is_active": True}, {"_id": 0})
-    if not game:
+async def get_game(game_id: str, request: Request, catalog: CatalogCache = Depends(get_catalog)):
+    entry = await catalog.load("games")
+    body = entry.bodies_by_id.get(game_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Game not found")
-    return game
+    return await catalog_response(request, body, body.etag)
 
 @app.get("/api/news")
-def get_news():
-    news = list(news_collection.find({"is_active": True}, {"_id": 0}))
-    return {"news": news}
+async def get_news(request: Request, catalog: CatalogCache = Depends(get_catalog)):
+    entry = await catalog.load("news")
+    return await catalog_response(request, entry.body, entry.etag)
 
 @app.get("/api/banners")
-def get_banners():
-    banners = list(banners_collection.find({"is_active": True}, {"_id": 0}))
-    return {"banners": banners}
+async def get_banners(request: Request, catalog: CatalogCache = Depends(get_catalog)):
+    entry = await catalog.load("banners")
+    return await catalog_response(request, entry.body, entry.etag)
+
+# Live catalog changes for open storefronts (see events.py)
+@app.get("/api/catalog/events")
+async def catalog_events(request: Request, events: CatalogEvents = Depends(get_events)):
+    return StreamingResponse(
+        events.stream(request.is_disconnected, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Resized WebP/JPEG copies of game and banner images (see images.py). Clients
+# add a v= token derived from image_url, so a changed image gets a new URL and
+# the long max-age is safe.
+IMAGE_CACHE_CONTROL = os.environ.get('IMAGE_CACHE_CONTROL', 'public, max-age=604800')
+
+@app.get("/api/images/{entity}/{item_id}")
+async def get_image(entity: str, item_id: str, request: Request,
+                    w: Optional[int] = Query(None, ge=1),
+                    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+                    db: Database = Depends(get_db), catalog: CatalogCache = Depends(get_catalog),
+                    images: ImageCache = Depends(get_images)):
+    if entity not in ("games", "banners"):
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Inactive items are not in the catalog cache but still show in the admin
+    item = await catalog.get(entity, item_id) or await getattr(db, entity).get_by_id(item_id)
+    if not item or not item.get("image_url"):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+    try:
+        data, key = await images.variant(item["image_url"], snap_width(w), fmt)
+    except ImageUnavailable as exc:
+        print(f"Image proxy: {exc}")
+        raise HTTPException(status_code=502, detail="Image unavailable")
+
+    headers = {"ETag": f'"{key}"', "Cache-Control": IMAGE_CACHE_CONTROL, "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=IMAGE_FORMATS[fmt], headers=headers)
 
 @app.post("/api/orders")
-def create_order(order: Order):
+async def create_order(order: Order, request: Request, db: Database = Depends(get_db),
+                       catalog: CatalogCache = Depends(get_catalog),
+                       limiter: RateLimiter = Depends(get_limiter),
+                       idempotency: IdempotencyStore = Depends(get_idempotency),
+                       idempotency_key: Optional[str] = Header(None),
+                       user_id: Optional[str] = Depends(get_optional_user_id)):
+    limiter.check("orders", client_ip(request), user_id)
+    if not idempotency_key:
+        return await place_order(order, request, db, catalog, user_id)
+    if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+
+    # Retries of the same checkout get the first attempt's response back
+    key = f"{user_id or ''}:{idempotency_key}"
+    request_hash = fingerprint(order.dict())
+    try:
+        replay = await idempotency.begin(key, request_hash)
+    except IdempotencyInProgress:
+        raise HTTPException(status_code=409, detail="Order is already being processed",
+                            headers={"Retry-After": "1"})
+    except IdempotencyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was used for a different order")
+    if replay is not None:
+        return ORJSONResponse(replay, headers={"Idempotent-Replayed": "true"})
+    try:
+        result = await place_order(order, request, db, catalog, user_id)
+    except Exception:
+        await idempotency.release(key)
+        raise
+    # The order is placed: complete() never raises, it retries the write itself
+    await idempotency.complete(key, request_hash, result)
+    return result
+
+async def place_order(order: Order, request: Request, db: Database, catalog: CatalogCache,
+                      user_id: Optional[str]) -> dict:
+    # Validate the client-submitted price against the in-memory price index
+    package = (await catalog.price_index()).get((order.game_id, order.amount))
+    if not package:
+        raise HTTPException(status_code=400, detail="Package not available")
+    if parse_price(package["price"]) != order.price or package["currency"] != order.currency:
+        raise HTTPException(status_code=400, detail="Price has changed, please refresh")
+    
     order_data = order.dict()
     order_data["id"] = str(uuid.uuid4())
+    order_data["user_id"] = user_id
     order_data["status"] = "pending"
     order_data["created_at"] = datetime.now().isoformat()
     
-    orders_collection.insert_one(order_data)
+    # With write-behind on, the order is acknowledged once it is fsynced to the
+    # local journal; the flusher inserts it into Mongo shortly after.
+    order_queue = request.app.state.order_queue
+    if order_queue:
+        await order_queue.enqueue(order_data)
+    else:
+        await db.orders.insert(order_data)
+        try:
+            await rollups.record_orders(db, [order_data])
+        except Exception as exc:
+            # Derived data: the order is placed, so never fail (and invite a
+            # duplicate retry) over it; rollups.py --rebuild fills the gap
+            print(f"Sales rollups: recording order {order_data['id']} failed: {exc}")
     
     return {
         "success": True,
         "order_id": order_data["id"],
-        "whatsapp_url": f"https://wa.me/967777826667?text=طلب جديد%0A----%0Aاللعبة: {order.game_name}%0Aالآي دي: {order.player_id}%0Aالكمية: {order.amount}%0Aالسعر: {order.price} {order.currency}%0Aاسم العميل: {order.customer_name}%0Aرقم الهاتف: {order.customer_phone}%0A----%0Aرقم الطلب: {order_data['id']}"
+        "whatsapp_url": f"https://wa.me/967777826667?text=طلب جديد%0A----%0Aاللعبة: {order.game_name}%0Aالآي دي: {order.player_id}%0Aالكمية: {order.amount}%0Aالسعر: {format_price(order.price)} {order.currency}%0Aاسم العميل: {order.customer_name}%0Aرقم الهاتف: {order.customer_phone}%0A----%0Aرقم الطلب: {order_data['id']}"
     }
 
 # User authentication routes
 @app.post("/api/users/register", response_model=Token)
-def register_user(user_data: UserRegister):
+async def register_user(user_data: UserRegister, request: Request, db: Database = Depends(get_db),
+                        passwords: PasswordHasher = Depends(get_passwords),
+                        limiter: RateLimiter = Depends(get_limiter)):
+    limiter.check("register", client_ip(request))
     # Check if username already exists
-    if users_collection.find_one({"username": user_data.username}):
+    if await db.users.get_by_username(user_data.username, {"_id": 1}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
     # Check if email already exists
-    if users_collection.find_one({"email": user_data.email}):
+    if await db.users.email_taken(user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -364,7 +701,7 @@ def register_user(user_data: UserRegister):
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await passwords.hash(user_data.password)
     
     new_user = {
         "id": user_id,
@@ -378,7 +715,7 @@ def register_user(user_data: UserRegister):
         "last_login": None
     }
     
-    users_collection.insert_one(new_user)
+    await db.users.insert(new_user)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -394,11 +731,14 @@ def register_user(user_data: UserRegister):
     }
 
 @app.post("/api/users/login", response_model=Token)
-def login_user(user_data: UserLogin):
+async def login_user(user_data: UserLogin, request: Request, db: Database = Depends(get_db),
+                     passwords: PasswordHasher = Depends(get_passwords),
+                     limiter: RateLimiter = Depends(get_limiter)):
+    limiter.check("login", client_ip(request), user_data.username)
     # Find user by username
-    user = users_collection.find_one({"username": user_data.username})
+    user = await db.users.get_by_username(user_data.username)
     
-    if not user or not verify_password(user_data.password, user["password"]):
+    if not user or not await passwords.verify(user_data.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -412,10 +752,8 @@ def login_user(user_data: UserLogin):
         )
     
     # Update last login
-    users_collection.update_one(
-        {"id": user["id"]},
-        {"$set": {"last_login": datetime.now().isoformat()}}
-    )
+    await db.users.update(user["id"], {"last_login": datetime.now().isoformat()})
+    invalidate_user(user["id"])
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -431,14 +769,15 @@ def login_user(user_data: UserLogin):
     }
 
 @app.get("/api/users/me")
-def get_user_profile(current_user=Depends(get_current_user)):
+async def get_user_profile(current_user=Depends(get_current_user)):
     return current_user
 
 @app.put("/api/users/me")
-def update_user_profile(profile_data: UserProfile, current_user=Depends(get_current_user)):
+async def update_user_profile(profile_data: UserProfile, current_user=Depends(get_current_user),
+                              db: Database = Depends(get_db)):
     # Check if email is being changed and if it's already taken
     if profile_data.email != current_user["email"]:
-        if users_collection.find_one({"email": profile_data.email, "id": {"$ne": current_user["id"]}}):
+        if await db.users.email_taken(profile_data.email, exclude_id=current_user["id"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
@@ -452,132 +791,371 @@ def update_user_profile(profile_data: UserProfile, current_user=Depends(get_curr
         "updated_at": datetime.now().isoformat()
     }
     
-    users_collection.update_one(
-        {"id": current_user["id"]},
-        {"$set": update_data}
-    )
+    await db.users.update(current_user["id"], update_data)
+    invalidate_user(current_user["id"])
     
     return {"success": True, "message": "Profile updated successfully"}
 
 @app.get("/api/users/orders")
-def get_user_orders(current_user=Depends(get_current_user)):
-    # Find orders by customer info (since we don't have user_id in orders yet)
-    # This is a simplified approach - in production, you'd link orders to user_id
-    orders = list(orders_collection.find(
-        {"customer_name": current_user["full_name"]},
-        {"_id": 0}
-    ).sort("created_at", -1))
-    
-    return {"orders": orders}
+async def get_user_orders(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user=Depends(get_current_user),
+    db: Database = Depends(get_db),
+):
+    # Served by the (user_id, created_at, id) index; orders placed before
+    # user_id existed are linked by backfill_order_users.py
+    after = decode_cursor(cursor) if cursor else None
+    orders, has_more = await db.orders.page({"user_id": current_user["id"]}, limit, after)
+    return {
+        "orders": orders,
+        "next_cursor": encode_cursor(orders[-1]) if has_more else None,
+    }
 
 # Admin routes
 @app.post("/api/admin/login")
-def admin_login(login_data: AdminLogin):
-    admin = admins_collection.find_one({"username": login_data.username})
+async def admin_login(login_data: AdminLogin, request: Request, db: Database = Depends(get_db),
+                      limiter: RateLimiter = Depends(get_limiter)):
+    limiter.check("admin_login", client_ip(request), login_data.username)
+    admin = await db.admins.get({"username": login_data.username})
     if not admin or admin["password"] != hashlib.sha256(login_data.password.encode()).hexdigest():
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = hashlib.sha256(f"{login_data.username}:{login_data.password}".encode()).hexdigest()
-    return {"token": token, "message": "Login successful"}
+    admin_cache.set(admin["id"], admin)
+    return {"token": create_admin_token(admin), "message": "Login successful"}
+
+@app.put("/api/admin/password")
+async def admin_change_password(password_data: AdminPasswordChange, admin=Depends(verify_admin),
+                                db: Database = Depends(get_db)):
+    if admin["password"] != hashlib.sha256(password_data.current_password.encode()).hexdigest():
+        raise HTTPException(status_code=400, detail="Current password is incorrect")
+    
+    new_password = hashlib.sha256(password_data.new_password.encode()).hexdigest()
+    await db.admins.update(admin["id"], {"password": new_password, "updated_at": datetime.now().isoformat()})
+    # Drop the cached record: tokens carrying the old fingerprint stop working
+    # here now, and on other workers within ADMIN_CACHE_TTL
+    admin_cache.pop(admin["id"])
+    
+    return {"success": True, "token": create_admin_token({**admin, "password": new_password})}
 
 @app.get("/api/admin/games")
-def admin_get_games(admin=Depends(verify_admin)):
-    games = list(games_collection.find({}, {"_id": 0}))
+async def admin_get_games(admin=Depends(verify_admin), db: Database = Depends(get_db)):
+    games = await db.games.find()
     return {"games": games}
 
 @app.post("/api/admin/games")
-def admin_create_game(game: Game, admin=Depends(verify_admin)):
+async def admin_create_game(game: Game, admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), images: ImageCache = Depends(get_images),
+        events: CatalogEvents = Depends(get_events)):
     game_data = game.dict()
     game_data["id"] = str(uuid.uuid4())
+    game_data["version"] = 1
     game_data["created_at"] = datetime.now().isoformat()
     
-    games_collection.insert_one(game_data)
+    await db.games.insert(game_data)
+    catalog.invalidate("games")
+    await publish_changes(events, "games", [("create", game_data["id"])])
+    images.prewarm(game_data["image_url"])
     return {"success": True, "id": game_data["id"]}
 
 @app.put("/api/admin/games/{game_id}")
-def admin_update_game(game_id: str, game: Game, admin=Depends(verify_admin)):
-    result = games_collection.update_one(
-        {"id": game_id},
-        {"$set": {**game.dict(), "updated_at": datetime.now().isoformat()}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Game not found")
-    return {"success": True}
+async def admin_update_game(game_id: str, game: Game, response: Response, if_match: Optional[str] = Header(None),
+        admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), images: ImageCache = Depends(get_images),
+        events: CatalogEvents = Depends(get_events)):
+    version = await save_catalog_item(db.games, game_id, game.dict(), if_match, response, "Game not found")
+    catalog.invalidate("games")
+    await publish_changes(events, "games", [("update", game_id)])
+    images.prewarm(game.image_url)
+    return {"success": True, "version": version}
+
+@app.patch("/api/admin/games/{game_id}")
+async def admin_patch_game(game_id: str, patch: GamePatch, response: Response, if_match: str = Depends(require_if_match),
+        admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), images: ImageCache = Depends(get_images),
+        events: CatalogEvents = Depends(get_events)):
+    fields = patch_fields(patch, Game)
+    version = await save_catalog_item(db.games, game_id, fields, if_match, response, "Game not found")
+    catalog.invalidate("games")
+    await publish_changes(events, "games", [("update", game_id)])
+    if "image_url" in fields:
+        images.prewarm(fields["image_url"])
+    return {"success": True, "version": version}
 
 @app.delete("/api/admin/games/{game_id}")
-def admin_delete_game(game_id: str, admin=Depends(verify_admin)):
-    result = games_collection.delete_one({"id": game_id})
-    if result.deleted_count == 0:
+async def admin_delete_game(game_id: str, admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog),
+        events: CatalogEvents = Depends(get_events)):
+    if not await db.games.delete(game_id):
         raise HTTPException(status_code=404, detail="Game not found")
+    catalog.invalidate("games")
+    await publish_changes(events, "games", [("delete", game_id)])
     return {"success": True}
 
 @app.get("/api/admin/news")
-def admin_get_news(admin=Depends(verify_admin)):
-    news = list(news_collection.find({}, {"_id": 0}))
+async def admin_get_news(admin=Depends(verify_admin), db: Database = Depends(get_db)):
+    news = await db.news.find()
     return {"news": news}
 
 @app.post("/api/admin/news")
-def admin_create_news(news_item: NewsItem, admin=Depends(verify_admin)):
+async def admin_create_news(news_item: NewsItem, admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog),
+        events: CatalogEvents = Depends(get_events)):
     news_data = news_item.dict()
     news_data["id"] = str(uuid.uuid4())
+    news_data["version"] = 1
     news_data["created_at"] = datetime.now().isoformat()
     
-    news_collection.insert_one(news_data)
+    await db.news.insert(news_data)
+    catalog.invalidate("news")
+    await publish_changes(events, "news", [("create", news_data["id"])])
     return {"success": True, "id": news_data["id"]}
 
 @app.put("/api/admin/news/{news_id}")
-def admin_update_news(news_id: str, news_item: NewsItem, admin=Depends(verify_admin)):
-    result = news_collection.update_one(
-        {"id": news_id},
-        {"$set": {**news_item.dict(), "updated_at": datetime.now().isoformat()}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="News not found")
-    return {"success": True}
+async def admin_update_news(news_id: str, news_item: NewsItem, response: Response, if_match: Optional[str] = Header(None),
+        admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog),
+        events: CatalogEvents = Depends(get_events)):
+    version = await save_catalog_item(db.news, news_id, news_item.dict(), if_match, response, "News not found")
+    catalog.invalidate("news")
+    await publish_changes(events, "news", [("update", news_id)])
+    return {"success": True, "version": version}
+
+@app.patch("/api/admin/news/{news_id}")
+async def admin_patch_news(news_id: str, patch: NewsPatch, response: Response, if_match: str = Depends(require_if_match),
+        admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog),
+        events: CatalogEvents = Depends(get_events)):
+    fields = patch_fields(patch, NewsItem)
+    version = await save_catalog_item(db.news, news_id, fields, if_match, response, "News not found")
+    catalog.invalidate("news")
+    await publish_changes(events, "news", [("update", news_id)])
+    return {"success": True, "version": version}
 
 @app.delete("/api/admin/news/{news_id}")
-def admin_delete_news(news_id: str, admin=Depends(verify_admin)):
-    result = news_collection.delete_one({"id": news_id})
-    if result.deleted_count == 0:
+async def admin_delete_news(news_id: str, admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog),
+        events: CatalogEvents = Depends(get_events)):
+    if not await db.news.delete(news_id):
         raise HTTPException(status_code=404, detail="News not found")
+    catalog.invalidate("news")
+    await publish_changes(events, "news", [("delete", news_id)])
     return {"success": True}
 
 @app.get("/api/admin/banners")
-def admin_get_banners(admin=Depends(verify_admin)):
-    banners = list(banners_collection.find({}, {"_id": 0}))
+async def admin_get_banners(admin=Depends(verify_admin), db: Database = Depends(get_db)):
+    banners = await db.banners.find()
     return {"banners": banners}
 
 @app.post("/api/admin/banners")
-def admin_create_banner(banner: Banner, admin=Depends(verify_admin)):
+async def admin_create_banner(banner: Banner, admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), images: ImageCache = Depends(get_images),
+        events: CatalogEvents = Depends(get_events)):
     banner_data = banner.dict()
     banner_data["id"] = str(uuid.uuid4())
+    banner_data["version"] = 1
     banner_data["created_at"] = datetime.now().isoformat()
     
-    banners_collection.insert_one(banner_data)
+    await db.banners.insert(banner_data)
+    catalog.invalidate("banners")
+    await publish_changes(events, "banners", [("create", banner_data["id"])])
+    images.prewarm(banner_data["image_url"])
     return {"success": True, "id": banner_data["id"]}
 
 @app.put("/api/admin/banners/{banner_id}")
-def admin_update_banner(banner_id: str, banner: Banner, admin=Depends(verify_admin)):
-    result = banners_collection.update_one(
-        {"id": banner_id},
-        {"$set": {**banner.dict(), "updated_at": datetime.now().isoformat()}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Banner not found")
-    return {"success": True}
+async def admin_update_banner(banner_id: str, banner: Banner, response: Response, if_match: Optional[str] = Header(None),
+        admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), images: ImageCache = Depends(get_images),
+        events: CatalogEvents = Depends(get_events)):
+    version = await save_catalog_item(db.banners, banner_id, banner.dict(), if_match, response, "Banner not found")
+    catalog.invalidate("banners")
+    await publish_changes(events, "banners", [("update", banner_id)])
+    images.prewarm(banner.image_url)
+    return {"success": True, "version": version}
+
+@app.patch("/api/admin/banners/{banner_id}")
+async def admin_patch_banner(banner_id: str, patch: BannerPatch, response: Response, if_match: str = Depends(require_if_match),
+        admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), images: ImageCache = Depends(get_images),
+        events: CatalogEvents = Depends(get_events)):
+    fields = patch_fields(patch, Banner)
+    version = await save_catalog_item(db.banners, banner_id, fields, if_match, response, "Banner not found")
+    catalog.invalidate("banners")
+    await publish_changes(events, "banners", [("update", banner_id)])
+    if "image_url" in fields:
+        images.prewarm(fields["image_url"])
+    return {"success": True, "version": version}
 
 @app.delete("/api/admin/banners/{banner_id}")
-def admin_delete_banner(banner_id: str, admin=Depends(verify_admin)):
-    result = banners_collection.delete_one({"id": banner_id})
-    if result.deleted_count == 0:
+async def admin_delete_banner(banner_id: str, admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog),
+        events: CatalogEvents = Depends(get_events)):
+    if not await db.banners.delete(banner_id):
         raise HTTPException(status_code=404, detail="Banner not found")
+    catalog.invalidate("banners")
+    await publish_changes(events, "banners", [("delete", banner_id)])
     return {"success": True}
 
+# Batched catalog writes (see bulk.py): one bulk_write, one cache invalidation
+# and one round of change events for the whole batch.
+BULK_DONE = ("created", "updated", "deleted")
+
+async def run_bulk(entity: str, body: BulkRequest, db: Database, catalog: CatalogCache,
+                   events: CatalogEvents, images: Optional[ImageCache] = None) -> dict:
+    results = await apply_bulk(getattr(db, entity), body.operations, body.ordered)
+    changed = [result for result in results if result["status"] in BULK_DONE]
+    if changed:
+        catalog.invalidate(entity)
+        await publish_changes(events, entity, [(result["op"], result["id"]) for result in changed])
+        if images:
+            for result in changed:
+                if result["op"] != "delete":
+                    images.prewarm(body.operations[result["index"]].data.image_url)
+    return {"success": len(changed) == len(results), "results": results}
+
+@app.post("/api/admin/games/bulk")
+async def admin_bulk_games(body: BulkRequest[Game], admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), events: CatalogEvents = Depends(get_events),
+        images: ImageCache = Depends(get_images)):
+    return await run_bulk("games", body, db, catalog, events, images)
+
+@app.post("/api/admin/news/bulk")
+async def admin_bulk_news(body: BulkRequest[NewsItem], admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), events: CatalogEvents = Depends(get_events)):
+    return await run_bulk("news", body, db, catalog, events)
+
+@app.post("/api/admin/banners/bulk")
+async def admin_bulk_banners(body: BulkRequest[Banner], admin=Depends(verify_admin), db: Database = Depends(get_db),
+        catalog: CatalogCache = Depends(get_catalog), events: CatalogEvents = Depends(get_events),
+        images: ImageCache = Depends(get_images)):
+    return await run_bulk("banners", body, db, catalog, events, images)
+
+@app.get("/api/admin/metrics")
+async def admin_get_metrics(request: Request, admin=Depends(verify_admin)):
+    return {
+        "password_pool": request.app.state.passwords.metrics(),
+        "token_cache": token_cache.metrics(),
+        "user_cache": user_cache.metrics(),
+        "order_queue": request.app.state.order_queue.metrics() if request.app.state.order_queue else None,
+        "image_cache": request.app.state.images.metrics(),
+        "catalog_events": request.app.state.events.metrics(),
+        "idempotency": request.app.state.idempotency.metrics(),
+        "search": request.app.state.catalog.search_metrics(),
+        "rate_limits": request.app.state.limiter.metrics(),
+        "startup": request.app.state.startup,
+    }
+
+# Shared admin order filters, used as a dependency
+def order_filters(
+    status: Optional[str] = None,
+    game_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> dict:
+    query = {}
+    if status:
+        query["status"] = status
+    if game_id:
+        query["game_id"] = game_id
+    # created_at is stored as a naive local isoformat string, which sorts lexically
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = stored_time(created_from)
+        if created_to:
+            query["created_at"]["$lt"] = stored_time(created_to)
+    return query
+
+def stored_time(value: datetime) -> str:
+    # A bound with an offset ("...+03:00", "...Z") is converted to the server's
+    # local time first; dropping the offset would shift it by that much
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
 @app.get("/api/admin/orders")
-def admin_get_orders(admin=Depends(verify_admin)):
-    orders = list(orders_collection.find({}, {"_id": 0}).sort("created_at", -1))
-    return {"orders": orders}
+async def admin_get_orders(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    query: dict = Depends(order_filters),
+    admin=Depends(verify_admin),
+    db: Database = Depends(get_db),
+):
+    after = decode_cursor(cursor) if cursor else None
+    orders, has_more = await db.orders.page(query, limit, after)
+    return {
+        "orders": orders,
+        "next_cursor": encode_cursor(orders[-1]) if has_more else None,
+    }
+
+@app.get("/api/admin/analytics")
+async def admin_get_analytics(
+    day_from: Optional[date] = None,
+    day_to: Optional[date] = None,
+    game_id: Optional[str] = None,
+    admin=Depends(verify_admin),
+    db: Database = Depends(get_db),
+):
+    # Served from the sales_rollups collection, never from raw orders
+    return await rollups.summarize(
+        db,
+        day_from.isoformat() if day_from else None,
+        day_to.isoformat() if day_to else None,
+        game_id,
+    )
+
+EXPORT_COLUMNS = [
+    "id", "created_at", "status", "game_id", "game_name", "player_id", "amount", "price",
+    "currency", "customer_name", "customer_phone", "customer_email", "user_id",
+]
+
+async def export_ndjson(orders):
+    async for order in orders:
+        yield json.dumps(order, ensure_ascii=False) + "\n"
+
+# Customer-supplied text starting with one of these is read as a formula by
+# spreadsheet apps; a leading ' makes it plain text
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def csv_safe(value):
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+async def export_csv(orders):
+    # BOM so spreadsheet apps open the Arabic text as UTF-8
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield "\ufeff" + buffer.getvalue()
+    async for order in orders:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow({key: csv_safe(value) for key, value in order.items()})
+        yield buffer.getvalue()
+
+@app.get("/api/admin/orders/export")
+async def admin_export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    query: dict = Depends(order_filters),
+    admin=Depends(verify_admin),
+    db: Database = Depends(get_db),
+):
+    # Rows are streamed straight off a batched Mongo cursor, so memory stays flat
+    # however many orders match.
+    orders = db.orders.stream(query)
+    filename = f"orders-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    if format == "csv":
+        body, media_type = export_csv(orders), "text/csv; charset=utf-8"
+    else:
+        body, media_type = export_ndjson(orders), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # Single process by default; WEB_CONCURRENCY>1 runs supervised workers
+    from serve import main
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the Arabic Gaming Store API
+Drives concurrent requests at the public endpoints and reports requests/sec.
+
+Usage:
+    python backend_bench.py http://localhost:8001
+    python backend_bench.py http://before:8001 http://after:8001   # side-by-side comparison
+"""
+
+import requests
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = ["api/games", "api/news", "api/banners"]
+
+class GamingStoreBenchmark:
+    def __init__(self, base_url="http://localhost:8001", concurrency=64, duration=15):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.duration = duration
+
+    def _worker(self, endpoint, deadline, latencies, errors, lock):
+        session = requests.Session()
+        url = f"{self.base_url}/{endpoint}"
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=10).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(elapsed)
+
+    def run_endpoint(self, endpoint):
+        """Hammer one endpoint for `duration` seconds"""
+        latencies, errors, lock = [], [], threading.Lock()
+        deadline = time.perf_counter() + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._worker, endpoint, deadline, latencies, errors, lock)
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+        return {
+            "rps": len(latencies) / self.duration,
+            "p50_ms": p50,
+            "p99_ms": p99,
+            "errors": len(errors),
+        }
+
+    def run_all(self):
+        print(f"🌐 {self.base_url} (concurrency={self.concurrency}, {self.duration}s per endpoint)")
+        results = {}
+        for endpoint in ENDPOINTS:
+            result = self.run_endpoint(endpoint)
+            results[endpoint] = result
+            print(f"   {endpoint:<14} {result['rps']:>8.1f} req/s  "
+                  f"p50 {result['p50_ms']:>7.1f} ms  p99 {result['p99_ms']:>7.1f} ms  "
+                  f"errors {result['errors']}")
+        return results
+
+def main():
+    urls = sys.argv[1:] or ["http://localhost:8001"]
+    runs = [GamingStoreBenchmark(url).run_all() for url in urls]
+
+    if len(runs) == 2:
+        before, after = runs
+        print("\n📊 Before → After")
+        for endpoint in ENDPOINTS:
+            old, new = before[endpoint]["rps"], after[endpoint]["rps"]
+            ratio = new / old if old else float("inf")
+            print(f"   {endpoint:<14} {old:>8.1f} → {new:>8.1f} req/s  (x{ratio:.2f})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,8 @@ Tests all public and admin endpoints
 import requests
 import sys
 import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import hashlib
 
@@ -43,6 +45,8 @@ class GamingStoreAPITester:
                 response = requests.post(url, json=data, headers=default_headers, timeout=10)
             elif method == 'PUT':
                 response = requests.put(url, json=data, headers=default_headers, timeout=10)
+            elif method == 'PATCH':
+                response = requests.patch(url, json=data, headers=default_headers, timeout=10)
             elif method == 'DELETE':
                 response = requests.delete(url, headers=default_headers, timeout=10)
 
@@ -103,6 +107,20 @@ class GamingStoreAPITester:
             except:
                 pass
 
+        # Test aggregated storefront endpoint
+        success, response = self.run_api_test("Get Storefront", "GET", "api/storefront", 200)
+        if success and response:
+            try:
+                data = response.json()
+                missing = [key for key in ('games', 'news', 'banners', 'version') if key not in data]
+                if missing:
+                    print(f"   ⚠️ Storefront payload missing: {missing}")
+                else:
+                    print(f"   🏪 Storefront v{data['version']}: {len(data['games'])} games, "
+                          f"{len(data['news'])} news, {len(data['banners'])} banners")
+            except:
+                pass
+
         return True
 
     def test_admin_login(self):
@@ -211,13 +229,50 @@ class GamingStoreAPITester:
                         success = False
                 except:
                     success = False
-            
+
+            self.test_idempotent_orders(order_data)
             return success
 
         except Exception as e:
             print(f"❌ Order creation test failed: {str(e)}")
             return False
 
+    def test_idempotent_orders(self, order_data):
+        """Test that retried checkouts with one Idempotency-Key place a single order"""
+        key_headers = {'Idempotency-Key': str(uuid.uuid4())}
+        success, first = self.run_api_test("Create Order (Idempotency-Key)", "POST", "api/orders", 200,
+                                           order_data, key_headers)
+        if not success or not first:
+            return False
+
+        success, replay = self.run_api_test("Replay Order (Same Key)", "POST", "api/orders", 200,
+                                            order_data, key_headers)
+        if success and replay:
+            self.log_test("Replay Returns Original Order",
+                          replay.json().get('order_id') == first.json().get('order_id')
+                          and replay.headers.get('Idempotent-Replayed') == 'true',
+                          f"Order ID: {replay.json().get('order_id')}")
+
+        changed = {**order_data, "player_id": "other_player_456"}
+        self.run_api_test("Reuse Key For Different Order", "POST", "api/orders", 422, changed, key_headers)
+
+        # Simultaneous retries: each gets the one order, or 409 while it is still being placed
+        concurrent_headers = {'Content-Type': 'application/json', 'Idempotency-Key': str(uuid.uuid4())}
+        def post_order(_):
+            return requests.post(f"{self.base_url}/api/orders", json=order_data,
+                                 headers=concurrent_headers, timeout=10)
+        try:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                responses = list(pool.map(post_order, range(4)))
+        except Exception as e:
+            return self.log_test("Concurrent Retries (Same Key)", False, f"Error: {str(e)}")
+        statuses = [response.status_code for response in responses]
+        order_ids = {response.json().get('order_id') for response in responses if response.status_code == 200}
+        in_flight_ok = all(response.headers.get('Retry-After') for response in responses if response.status_code == 409)
+        return self.log_test("Concurrent Retries (Same Key)",
+                             set(statuses) <= {200, 409} and len(order_ids) == 1 and in_flight_ok,
+                             f"Statuses: {statuses}, distinct orders: {len(order_ids)}")
+
     def test_admin_crud_operations(self):
         """Test admin CRUD operations"""
         if not self.admin_token:
@@ -251,7 +306,9 @@ class GamingStoreAPITester:
                     updated_news = news_data.copy()
                     updated_news['title_ar'] = "خبر تجريبي محدث"
                     
-                    self.run_api_test("Update News Item", "PUT", f"api/admin/news/{news_id}", 200, updated_news, auth_headers)
+                    success, response = self.run_api_test("Update News Item", "PUT", f"api/admin/news/{news_id}", 200, updated_news, auth_headers)
+                    if success and response:
+                        self.test_patch_preconditions(news_id, response.json().get('version'), auth_headers)
                     
                     # Test deleting the news item
                     self.run_api_test("Delete News Item", "DELETE", f"api/admin/news/{news_id}", 200, headers=auth_headers)
@@ -261,6 +318,24 @@ class GamingStoreAPITester:
 
         return True
 
+    def test_patch_preconditions(self, news_id, version, auth_headers):
+        """Test partial updates guarded by If-Match versions"""
+        url = f"api/admin/news/{news_id}"
+        patch = {"title": "Patched News"}
+
+        self.run_api_test("Patch News (No If-Match)", "PATCH", url, 428, patch, auth_headers)
+        success, response = self.run_api_test("Patch News (Current Version)", "PATCH", url, 200, patch,
+                                              {**auth_headers, 'If-Match': f'"{version}"'})
+        if success and response:
+            new_version = response.json().get('version')
+            self.log_test("Patch Bumps Version", new_version == version + 1,
+                          f"{version} -> {new_version}, ETag: {response.headers.get('ETag')}")
+        # The version we started from is stale now
+        self.run_api_test("Patch News (Stale Version)", "PATCH", url, 412, {"title": "Lost Update"},
+                          {**auth_headers, 'If-Match': f'"{version}"'})
+        self.run_api_test("Patch News (Empty)", "PATCH", url, 400, {},
+                          {**auth_headers, 'If-Match': '*'})
+
     def test_user_authentication(self):
         """Test user registration and authentication system"""
         print("\n👤 Testing User Authentication System...")
@@ -459,6 +534,22 @@ class GamingStoreAPITester:
         
         return True
 
+    def test_rate_limiting(self):
+        """Test that repeated logins for one account are throttled (server defaults: 5/60)"""
+        print("\n🚦 Testing Rate Limiting...")
+
+        # An account nobody owns, so no real user is locked out
+        probe = {"username": f"ratelimit_probe_{datetime.now().strftime('%H%M%S%f')}", "password": "wrong"}
+        for attempt in range(1, 6):
+            self.run_api_test(f"Login Before Limit ({attempt}/5)", "POST", "api/users/login", 401, probe)
+
+        success, response = self.run_api_test("Login Over Limit", "POST", "api/users/login", 429, probe)
+        if success and response:
+            retry_after = response.headers.get('Retry-After', '')
+            self.log_test("Retry-After Header", retry_after.isdigit() and int(retry_after) >= 1,
+                          f"Retry-After: {retry_after or 'missing'}")
+        return success
+
     def run_all_tests(self):
         """Run all tests"""
         print("🚀 Starting Arabic Gaming Store API Tests")
@@ -479,6 +570,7 @@ class GamingStoreAPITester:
         self.test_order_creation()
         self.test_admin_crud_operations()
         self.test_unauthorized_access()
+        self.test_rate_limiting()
 
         # Print summary
         print("\n" + "=" * 60)
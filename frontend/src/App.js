@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './App.css';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './components/ui/card';
 import { Button } from './components/ui/button';
@@ -13,8 +13,18 @@ import { GamepadIcon, ShoppingCartIcon, StarIcon, PhoneIcon, MailIcon, UserIcon,
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+// Resized copy of a game/banner image from the backend image cache. The v token
+// changes whenever image_url does, so browsers never keep a stale picture.
+const imageSrc = (entity, item, width) => {
+  let hash = 0;
+  for (const ch of item.image_url || '') hash = (hash * 31 + ch.charCodeAt(0)) | 0;
+  return `${API_BASE_URL}/api/images/${entity}/${item.id}?w=${width}&v=${(hash >>> 0).toString(36)}`;
+};
+
 export default function App() {
   const [games, setGames] = useState([]);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);  // null: not searching
   const [news, setNews] = useState([]);
   const [banners, setBanners] = useState([]);
   const [selectedGame, setSelectedGame] = useState(null);
@@ -27,6 +37,9 @@ export default function App() {
   });
   const [loading, setLoading] = useState(false);
   const [showOrderDialog, setShowOrderDialog] = useState(false);
+  // One Idempotency-Key per checkout, reused when the customer resubmits after a
+  // network error so the order is only placed once
+  const orderKey = useRef(null);
   const [currentBanner, setCurrentBanner] = useState(0);
   
   // Admin states
@@ -36,6 +49,9 @@ export default function App() {
   const [adminForm, setAdminForm] = useState({ username: '', password: '' });
   const [adminData, setAdminData] = useState({ games: [], news: [], banners: [], orders: [] });
   const [showAdminForm, setShowAdminForm] = useState({ type: '', show: false, data: null });
+  const [ordersCursor, setOrdersCursor] = useState(null);
+  const [ordersGameFilter, setOrdersGameFilter] = useState('');
+  const [loadingOrders, setLoadingOrders] = useState(false);
   
   // User states
   const [isLoggedIn, setIsLoggedIn] = useState(false);
@@ -52,10 +68,25 @@ export default function App() {
     phone: ''
   });
   const [userOrders, setUserOrders] = useState([]);
+  const [userOrdersCursor, setUserOrdersCursor] = useState(null);
 
   useEffect(() => {
     fetchData();
+  }, []);
+
+  useEffect(() => {
+    // Live catalog changes: apply each delta instead of refetching everything.
+    // EventSource reconnects on its own and resumes from the last event id;
+    // "reset" means the server could not fill the gap, so start over.
+    const source = new EventSource(`${API_BASE_URL}/api/catalog/events`);
+    source.addEventListener('change', (e) => applyCatalogChange(JSON.parse(e.data)));
+    source.addEventListener('reset', () => fetchData({ cache: 'no-cache' }));
+    return () => source.close();
+  }, []);
+
+  useEffect(() => {
     // Banner carousel
+    if (banners.length === 0) return;
     const interval = setInterval(() => {
       setCurrentBanner(prev => (prev + 1) % banners.length);
     }, 4000);
@@ -76,26 +107,65 @@ export default function App() {
     }
   }, [userToken]);
 
-  const fetchData = async () => {
+  // Server-side search (/api/games/search), debounced while typing
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `${API_BASE_URL}/api/games/search?q=${encodeURIComponent(query)}`,
+          { signal: controller.signal }
+        );
+        const data = await response.json();
+        setSearchResults(data.games || []);
+      } catch (error) {
+        if (error.name !== 'AbortError') console.error('Search error:', error);
+      }
+    }, 250);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [searchQuery, games]);
+
+  const fetchData = async (fetchOptions = {}) => {
     try {
-      const [gamesRes, newsRes, bannersRes] = await Promise.all([
-        fetch(`${API_BASE_URL}/api/games`),
-        fetch(`${API_BASE_URL}/api/news`),
-        fetch(`${API_BASE_URL}/api/banners`)
-      ]);
-      
-      const gamesData = await gamesRes.json();
-      const newsData = await newsRes.json();
-      const bannersData = await bannersRes.json();
+      // Games, news and banners arrive together in one storefront payload
+      const response = await fetch(`${API_BASE_URL}/api/storefront`, fetchOptions);
+      const data = await response.json();
       
-      setGames(gamesData.games || []);
-      setNews(newsData.news || []);
-      setBanners(bannersData.banners || []);
+      setGames(data.games || []);
+      setNews(data.news || []);
+      setBanners(data.banners || []);
     } catch (error) {
       console.error('Error fetching data:', error);
     }
   };
 
+  const applyCatalogChange = ({ entity, id, item }) => {
+    const setters = { games: setGames, news: setNews, banners: setBanners };
+    const setItems = setters[entity];
+    if (!setItems) return;
+    setItems(prev => {
+      if (!item) return prev.filter(existing => existing.id !== id);  // deleted or deactivated
+      return prev.some(existing => existing.id === id)
+        ? prev.map(existing => existing.id === id ? item : existing)
+        : [...prev, item];
+    });
+  };
+
+  const ordersUrl = (cursor = null, gameId = ordersGameFilter) => {
+    const params = new URLSearchParams({ limit: '50' });
+    if (cursor) params.set('cursor', cursor);
+    if (gameId) params.set('game_id', gameId);
+    return `${API_BASE_URL}/api/admin/orders?${params}`;
+  };
+
   const fetchAdminData = async () => {
     if (!adminToken) return;
     
@@ -105,9 +175,15 @@ export default function App() {
         fetch(`${API_BASE_URL}/api/admin/games`, { headers }),
         fetch(`${API_BASE_URL}/api/admin/news`, { headers }),
         fetch(`${API_BASE_URL}/api/admin/banners`, { headers }),
-        fetch(`${API_BASE_URL}/api/admin/orders`, { headers })
+        fetch(ordersUrl(), { headers })
       ]);
       
+      // Admin sessions expire; drop a stale token instead of rendering empty lists
+      if ([gamesRes, newsRes, bannersRes, ordersRes].some(res => res.status === 401)) {
+        handleLogout();
+        return;
+      }
+      
       const gamesData = await gamesRes.json();
       const newsData = await newsRes.json();
       const bannersData = await bannersRes.json();
@@ -119,11 +195,40 @@ export default function App() {
         banners: bannersData.banners || [],
         orders: ordersData.orders || []
       });
+      setOrdersCursor(ordersData.next_cursor || null);
     } catch (error) {
       console.error('Error fetching admin data:', error);
     }
   };
 
+  // Orders are paged by the backend; the first page arrives with fetchAdminData
+  // and later pages are appended on demand.
+  const fetchOrdersPage = async (cursor = null, gameId = ordersGameFilter) => {
+    if (!adminToken) return;
+    
+    setLoadingOrders(true);
+    try {
+      const headers = { 'Authorization': `Bearer ${adminToken}` };
+      const response = await fetch(ordersUrl(cursor, gameId), { headers });
+      const data = await response.json();
+      
+      setAdminData(prev => ({
+        ...prev,
+        orders: cursor ? [...prev.orders, ...(data.orders || [])] : (data.orders || [])
+      }));
+      setOrdersCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching orders:', error);
+    } finally {
+      setLoadingOrders(false);
+    }
+  };
+
+  const handleOrdersGameFilter = (gameId) => {
+    setOrdersGameFilter(gameId);
+    fetchOrdersPage(null, gameId);
+  };
+
   const fetchUserProfile = async () => {
     if (!userToken) return;
     
@@ -144,22 +249,28 @@ export default function App() {
     }
   };
 
-  const fetchUserOrders = async () => {
+  const fetchUserOrders = async (cursor = null) => {
     if (!userToken) return;
     
     try {
       const headers = { 'Authorization': `Bearer ${userToken}` };
-      const response = await fetch(`${API_BASE_URL}/api/users/orders`, { headers });
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await fetch(`${API_BASE_URL}/api/users/orders${query}`, { headers });
       
       if (response.ok) {
         const data = await response.json();
-        setUserOrders(data.orders || []);
+        setUserOrders(prev => cursor ? [...prev, ...(data.orders || [])] : (data.orders || []));
+        setUserOrdersCursor(data.next_cursor || null);
       }
     } catch (error) {
       console.error('Error fetching user orders:', error);
     }
   };
 
+  // Rate-limited requests (429) say how long to wait in Retry-After
+  const tooManyRequestsMessage = (response) =>
+    `طلبات كثيرة جداً، يرجى المحاولة بعد ${response.headers.get('Retry-After') || 60} ثانية`;
+
   const handleAdminLogin = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -179,6 +290,8 @@ export default function App() {
         setIsAdmin(true);
         setShowAdminLogin(false);
         setAdminForm({ username: '', password: '' });
+      } else if (response.status === 429) {
+        alert(tooManyRequestsMessage(response));
       } else {
         alert('بيانات الدخول غير صحيحة');
       }
@@ -201,6 +314,7 @@ export default function App() {
     setUserToken(null);
     setCurrentUser(null);
     setUserOrders([]);
+    setUserOrdersCursor(null);
     localStorage.removeItem('user_token');
     setShowUserDashboard(false);
   };
@@ -234,6 +348,8 @@ export default function App() {
           ? 'تم تسجيل الدخول بنجاح!' 
           : 'تم إنشاء الحساب بنجاح!';
         alert(successMessage);
+      } else if (response.status === 429) {
+        alert(tooManyRequestsMessage(response));
       } else {
         const errorMessage = authMode === 'login'
           ? 'خطأ في بيانات الدخول'
@@ -251,6 +367,7 @@ export default function App() {
   const handlePurchase = (game, packageInfo) => {
     setSelectedGame(game);
     setSelectedPackage(packageInfo);
+    orderKey.current = crypto.randomUUID();
     
     // Pre-fill form if user is logged in
     if (isLoggedIn && currentUser) {
@@ -282,9 +399,15 @@ export default function App() {
         customer_email: orderForm.customer_email
       };
       
+      // Logged-in customers send their token so the order shows up in their history
+      const headers = { 'Content-Type': 'application/json', 'Idempotency-Key': orderKey.current };
+      if (isLoggedIn && userToken) {
+        headers['Authorization'] = `Bearer ${userToken}`;
+      }
+      
       const response = await fetch(`${API_BASE_URL}/api/orders`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers,
         body: JSON.stringify(orderData)
       });
       
@@ -296,6 +419,8 @@ export default function App() {
         setShowOrderDialog(false);
         setOrderForm({ player_id: '', customer_name: '', customer_phone: '', customer_email: '' });
         alert('تم إرسال طلبك بنجاح! سيتم توجيهك للواتساب لإكمال الطلب');
+      } else if (response.status === 429) {
+        alert(tooManyRequestsMessage(response));
       } else {
         alert('حدث خطأ في إرسال الطلب');
       }
@@ -322,8 +447,18 @@ export default function App() {
         method = 'POST';
         body = JSON.stringify(data);
       } else if (action === 'update') {
+        // Send only the changed fields, conditional on the version we loaded
+        const original = adminData[type].find(item => item.id === id) || {};
+        data = Object.fromEntries(Object.entries(data).filter(
+          ([key, value]) => JSON.stringify(value) !== JSON.stringify(original[key])
+        ));
+        if (Object.keys(data).length === 0) {
+          setShowAdminForm({ type: '', show: false, data: null });
+          return;
+        }
         url += `/${id}`;
-        method = 'PUT';
+        method = 'PATCH';
+        headers['If-Match'] = `"${original.version || 0}"`;
         body = JSON.stringify(data);
       } else if (action === 'delete') {
         url += `/${id}`;
@@ -333,10 +468,28 @@ export default function App() {
       const response = await fetch(url, { method, headers, body });
       
       if (response.ok) {
-        fetchAdminData();
-        fetchData(); // Refresh public data too
+        const result = await response.json();
+        // Patch the admin list in place; the storefront state (in every open
+        // tab, this one included) is updated by the catalog event stream.
+        setAdminData(prev => {
+          const items = prev[type];
+          let next;
+          if (action === 'create') {
+            next = [...items, { ...data, id: result.id, version: 1 }];
+          } else if (action === 'update') {
+            next = items.map(item => item.id === id ? { ...item, ...data, version: result.version } : item);
+          } else {
+            next = items.filter(item => item.id !== id);
+          }
+          return { ...prev, [type]: next };
+        });
         setShowAdminForm({ type: '', show: false, data: null });
         alert('تم تنفيذ العملية بنجاح');
+      } else if (response.status === 412) {
+        // Someone else saved this item first: reload instead of overwriting their changes
+        alert('تم تعديل هذا العنصر من قبل مسؤول آخر، تم تحديث البيانات. يرجى إعادة التعديل');
+        setShowAdminForm({ type: '', show: false, data: null });
+        fetchAdminData();
       } else {
         alert('حدث خطأ في تنفيذ العملية');
       }
@@ -380,7 +533,7 @@ export default function App() {
                     <CardContent className="p-4">
                       <div className="flex justify-between items-start">
                         <div className="flex gap-4">
-                          <img src={game.image_url} alt={game.name_ar} className="w-16 h-16 object-cover rounded" />
+                          <img src={imageSrc('games', game, 160)} alt={game.name_ar} className="w-16 h-16 object-cover rounded" />
                           <div>
                             <h3 className="font-bold text-lg">{game.name_ar}</h3>
                             <p className="text-gray-400">{game.description_ar}</p>
@@ -453,7 +606,7 @@ export default function App() {
                     <CardContent className="p-4">
                       <div className="flex justify-between items-start">
                         <div className="flex gap-4">
-                          <img src={banner.image_url} alt={banner.title_ar} className="w-24 h-16 object-cover rounded" />
+                          <img src={imageSrc('banners', banner, 160)} alt={banner.title_ar} className="w-24 h-16 object-cover rounded" />
                           <div>
                             <h3 className="font-bold text-lg">{banner.title_ar}</h3>
                             <p className="text-gray-400">{banner.link}</p>
@@ -478,7 +631,19 @@ export default function App() {
             </TabsContent>
 
             <TabsContent value="orders">
-              <h2 className="text-2xl font-bold mb-6">الطلبات</h2>
+              <div className="flex justify-between items-center mb-6">
+                <h2 className="text-2xl font-bold">الطلبات</h2>
+                <select
+                  value={ordersGameFilter}
+                  onChange={(e) => handleOrdersGameFilter(e.target.value)}
+                  className="bg-gray-800 border border-gray-700 rounded px-3 py-2 text-white"
+                >
+                  <option value="">كل الألعاب</option>
+                  {adminData.games.map(game => (
+                    <option key={game.id} value={game.id}>{game.name_ar}</option>
+                  ))}
+                </select>
+              </div>
               <div className="grid gap-4">
                 {adminData.orders.map(order => (
                   <Card key={order.id} className="bg-gray-800 border-gray-700">
@@ -506,6 +671,13 @@ export default function App() {
                   </Card>
                 ))}
               </div>
+              {ordersCursor && (
+                <div className="flex justify-center mt-6">
+                  <Button onClick={() => fetchOrdersPage(ordersCursor)} disabled={loadingOrders}>
+                    {loadingOrders ? 'جاري التحميل...' : 'تحميل المزيد'}
+                  </Button>
+                </div>
+              )}
             </TabsContent>
           </Tabs>
         </div>
@@ -771,7 +943,7 @@ export default function App() {
             >
               <div
                 className="w-full h-full bg-cover bg-center relative"
-                style={{ backgroundImage: `url(${banner.image_url})` }}
+                style={{ backgroundImage: `url(${imageSrc('banners', banner, 1280)})` }}
               >
                 <div className="absolute inset-0 bg-gradient-to-r from-black/70 to-transparent">
                   <div className="container mx-auto px-4 h-full flex items-center">
@@ -811,15 +983,27 @@ export default function App() {
             الألعاب المتاحة
           </h2>
           <p className="text-gray-400 text-lg">اختر لعبتك المفضلة واحصل على الشحن فوراً</p>
+          <Input
+            type="search"
+            value={searchQuery}
+            onChange={(e) => setSearchQuery(e.target.value)}
+            placeholder="ابحث عن لعبة..."
+            className="max-w-md mx-auto mt-6 bg-gray-800 border-gray-700 text-white text-right"
+            dir="rtl"
+          />
         </div>
 
+        {searchResults && searchResults.length === 0 && (
+          <p className="text-center text-gray-400">لا توجد نتائج مطابقة</p>
+        )}
         <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-8">
-          {games.map((game, index) => (
+          {(searchResults || games).map((game, index) => (
             <Card key={game.id} className={`bg-gray-800/50 border-gray-700 hover:bg-gray-800/70 transition-all duration-300 backdrop-blur-sm card-hover card-entrance delay-${index * 100}`}>
               <CardHeader className="pb-4">
                 <img
-                  src={game.image_url}
+                  src={imageSrc('games', game, 640)}
                   alt={game.name_ar}
+                  loading="lazy"
                   className="w-full h-48 object-cover rounded-lg mb-4 hover-scale"
                 />
                 <CardTitle className="text-xl text-right gradient-text">{game.name_ar}</CardTitle>
@@ -1005,7 +1189,7 @@ export default function App() {
             <Tabs defaultValue="profile" className="w-full">
               <TabsList className="grid w-full grid-cols-2">
                 <TabsTrigger value="profile">الملف الشخصي</TabsTrigger>
-                <TabsTrigger value="orders" onClick={fetchUserOrders}>طلباتي</TabsTrigger>
+                <TabsTrigger value="orders" onClick={() => fetchUserOrders()}>طلباتي</TabsTrigger>
               </TabsList>
               
               <TabsContent value="profile" className="space-y-4">
@@ -1093,6 +1277,13 @@ export default function App() {
                       ))}
                     </div>
                   )}
+                  {userOrdersCursor && (
+                    <div className="flex justify-center">
+                      <Button variant="outline" onClick={() => fetchUserOrders(userOrdersCursor)}>
+                        تحميل المزيد
+                      </Button>
+                    </div>
+                  )}
                 </div>
               </TabsContent>
             </Tabs>
@@ -1105,8 +1296,9 @@ export default function App() {
 
 // Admin Form Modal Component
 function AdminFormModal({ type, data, onClose, onSubmit }) {
+  // A private copy: edits must not reach the item in adminData before it is saved
   const [formData, setFormData] = useState(
-    data || (type === 'games' ? {
+    (data && structuredClone(data)) || (type === 'games' ? {
       name: '', name_ar: '', description: '', description_ar: '',
       image_url: '', prices: [{ amount: '', price: '', currency: 'ريال' }], is_active: true
     } : type === 'news' ? {
@@ -1129,8 +1321,15 @@ function AdminFormModal({ type, data, onClose, onSubmit }) {
   };
 
   const updatePrice = (index, field, value) => {
+    // New objects all the way down: the originals are still referenced by
+    // adminData, which handleAdminAction diffs against to build the PATCH
     const newPrices = [...formData.prices];
-    newPrices[index][field] = value;
+    const price = { ...newPrices[index], [field]: value };
+    if (field === 'amount') {
+      // The server re-derives the numeric quantity from the new label
+      delete price.quantity;
+    }
+    newPrices[index] = price;
     setFormData({ ...formData, prices: newPrices });
   };
 
@@ -1223,6 +1422,9 @@ function AdminFormModal({ type, data, onClose, onSubmit }) {
                     />
                     <Input
                       placeholder="السعر"
+                      type="number"
+                      step="any"
+                      min="0"
                       value={price.price}
                       onChange={(e) => updatePrice(index, 'price', e.target.value)}
                       className="bg-gray-800 border-gray-600 text-white"
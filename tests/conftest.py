@@ -0,0 +1,56 @@
+"""
+Shared fixtures. The app runs in-process against mongomock, so these tests
+need no Mongo server or network: image originals come from an (empty)
+IMAGE_SOURCE_DIR and every cache or journal directory lives in a temp dir.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+_scratch = tempfile.mkdtemp(prefix="gaming_store_tests-")
+for name in ("IMAGE_CACHE_DIR", "IMAGE_SOURCE_DIR", "ORDER_JOURNAL_DIR"):
+    os.environ.setdefault(name, os.path.join(_scratch, name.lower()))
+    os.makedirs(os.environ[name], exist_ok=True)
+os.environ.setdefault("MONGO_ENSURE_INDEXES", "true")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import mongomock_motor  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+ADMIN_LOGIN = {"username": "admin", "password": "xliunx"}
+
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    import server
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(server, "AsyncIOMotorClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(server, "ORDER_WRITE_BEHIND", False)
+    return client
+
+
+def wait_until_ready(test_client, timeout: float = 10.0):
+    # Startup work that needs Mongo finishes in the background
+    deadline = time.monotonic() + timeout
+    while test_client.get("/api/health/ready").status_code != 200:
+        assert time.monotonic() < deadline, "server did not become ready"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def client(mongo_client):
+    import server
+    with TestClient(server.app) as test_client:
+        wait_until_ready(test_client)
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers(client):
+    response = client.post("/api/admin/login", json=ADMIN_LOGIN)
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
@@ -0,0 +1,51 @@
+import jwt
+
+import lru
+import server
+from tests.conftest import ADMIN_LOGIN
+
+
+def change_password(client, headers, current, new):
+    return client.put("/api/admin/password", headers=headers,
+                      json={"current_password": current, "new_password": new})
+
+
+def test_password_change_revokes_earlier_tokens(client, admin_headers):
+    other = {"Authorization": f"Bearer {client.post('/api/admin/login', json=ADMIN_LOGIN).json()['token']}"}
+    assert client.get("/api/admin/games", headers=other).status_code == 200
+
+    response = change_password(client, admin_headers, ADMIN_LOGIN["password"], "n3w-secret")
+    assert response.status_code == 200
+    fresh = {"Authorization": f"Bearer {response.json()['token']}"}
+
+    for old in (admin_headers, other):
+        assert client.get("/api/admin/games", headers=old).status_code == 401
+    assert client.get("/api/admin/games", headers=fresh).status_code == 200
+    assert client.post("/api/admin/login", json=ADMIN_LOGIN).status_code == 401
+    assert client.post("/api/admin/login", json={**ADMIN_LOGIN, "password": "n3w-secret"}).status_code == 200
+
+
+def test_tokens_must_be_admin_tokens_signed_with_the_secret(client, admin_headers):
+    claims = jwt.decode(admin_headers["Authorization"].split()[1], server.SECRET_KEY, algorithms=[server.ALGORITHM])
+    forged = [
+        jwt.encode({**claims, "pwv": "0" * 16}, server.SECRET_KEY, algorithm=server.ALGORITHM),
+        jwt.encode({**claims, "role": "user"}, server.SECRET_KEY, algorithm=server.ALGORITHM),
+        jwt.encode(claims, "not-the-secret", algorithm=server.ALGORITHM),
+    ]
+    for token in forged:
+        assert client.get("/api/admin/games", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_other_workers_notice_a_password_change_within_the_cache_ttl(client, admin_headers, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    admin_id = jwt.decode(admin_headers["Authorization"].split()[1], options={"verify_signature": False})["sub"]
+    assert client.get("/api/admin/games", headers=admin_headers).status_code == 200
+    stale = server.admin_cache.get(admin_id)
+
+    assert change_password(client, admin_headers, ADMIN_LOGIN["password"], "n3w-secret").status_code == 200
+    # Another worker still holds the record it cached before the change
+    server.admin_cache.set(admin_id, stale)
+    assert client.get("/api/admin/games", headers=admin_headers).status_code == 200
+    now[0] += server.ADMIN_CACHE_TTL
+    assert client.get("/api/admin/games", headers=admin_headers).status_code == 401
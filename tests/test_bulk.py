@@ -0,0 +1,91 @@
+import asyncio
+
+import mongomock_motor
+
+from bulk import BulkOperation, apply_bulk
+from repositories import Database
+from server import NewsItem
+
+NEWS = {"title": "t", "title_ar": "ت", "content": "c", "content_ar": "م"}
+
+
+def operation(op, item_id=None, version=None):
+    return BulkOperation[NewsItem](op=op, id=item_id, version=version,
+                                   data=None if op == "delete" else NewsItem(**NEWS))
+
+
+async def news_repository(*ids):
+    db = Database(mongomock_motor.AsyncMongoMockClient())
+    for item_id in ids:
+        await db.news.insert({"id": item_id, **NEWS, "version": 1})
+    return db.news
+
+
+def racing(repo, concurrent_writes):
+    # Run concurrent_writes right after apply_bulk has read the versions,
+    # before its bulk_write: another admin got there in between
+    read_versions = repo.versions
+
+    async def versions(ids):
+        found = await read_versions(ids)
+        await concurrent_writes()
+        return found
+    repo.versions = versions
+
+
+def test_batch_results_in_request_order():
+    async def main():
+        repo = await news_repository("a", "b")
+        results = await apply_bulk(repo, [
+            operation("create"),
+            operation("update", "a"),
+            operation("delete", "b"),
+            operation("update", "b"),
+            operation("update", "a", version=1),
+            operation("delete", "missing"),
+        ])
+        assert [r["status"] for r in results] == ["created", "updated", "deleted", "not_found", "conflict",
+                                                  "not_found"]
+        assert results[1]["version"] == 2 and results[4]["version"] == 2
+        assert await repo.count() == 2
+    asyncio.run(main())
+
+
+def test_writes_that_lose_a_race_are_rechecked():
+    async def main():
+        repo = await news_repository("a", "b", "c", "d", "e")
+
+        async def concurrent_writes():
+            await repo.delete("a")
+            await repo.collection.update_one({"id": "b"}, {"$inc": {"version": 1}})
+            await repo.collection.update_one({"id": "d"}, {"$inc": {"version": 1}})
+        racing(repo, concurrent_writes)
+
+        results = await apply_bulk(repo, [
+            operation("update", "a"),               # deleted meanwhile
+            operation("update", "b", version=1),    # edited meanwhile
+            operation("update", "c", version=1),    # untouched
+            operation("delete", "d", version=1),    # edited meanwhile
+            operation("delete", "e"),               # untouched
+        ], ordered=False)
+        assert [r["status"] for r in results] == ["not_found", "conflict", "updated", "conflict", "deleted"]
+        assert results[1]["version"] == 2 and results[3]["version"] == 2
+        assert "version" not in results[0]
+        assert {doc["id"] for doc in await repo.find()} == {"b", "c", "d"}
+    asyncio.run(main())
+
+
+def test_no_recheck_when_every_write_matched():
+    async def main():
+        repo = await news_repository("a")
+        reads = []
+        find = repo.collection.find
+
+        def counting_find(*args, **kwargs):
+            reads.append(args)
+            return find(*args, **kwargs)
+        repo.collection.find = counting_find
+        results = await apply_bulk(repo, [operation("update", "a", version=1)])
+        assert results[0]["status"] == "updated"
+        assert len(reads) == 1  # the version pre-read only
+    asyncio.run(main())
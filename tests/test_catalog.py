@@ -0,0 +1,85 @@
+import asyncio
+
+from catalog import CatalogCache
+
+
+class FakeRepository:
+    def __init__(self, items):
+        self.items = items
+        self.reads = 0
+        self.gate = None  # an asyncio.Event to hold reads at, once set
+
+    async def find_active(self):
+        self.reads += 1
+        snapshot = [dict(item) for item in self.items]
+        if self.gate:
+            await self.gate.wait()
+        return snapshot
+
+
+class FakeDatabase:
+    def __init__(self, **items):
+        for entity in ("games", "news", "banners"):
+            setattr(self, entity, FakeRepository(items.get(entity, [])))
+
+
+def test_load_is_cached_until_invalidated():
+    async def main():
+        db = FakeDatabase(games=[{"id": "g1"}])
+        catalog = CatalogCache(db)
+        first = await catalog.load("games")
+        assert await catalog.load("games") is first and db.games.reads == 1
+        catalog.invalidate("games")
+        assert (await catalog.load("games")).items == [{"id": "g1"}] and db.games.reads == 2
+    asyncio.run(main())
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    async def main():
+        db = FakeDatabase(games=[{"id": "g1"}, {"id": "g2"}])
+        catalog = CatalogCache(db)
+        db.games.gate = asyncio.Event()
+        # A rebuild reads the catalog while g2 is still there...
+        stale_read = asyncio.create_task(catalog.load("games"))
+        await asyncio.sleep(0)
+        assert db.games.reads == 1
+        # ...then an admin deletes it and invalidates before the read returns
+        db.games.items = [{"id": "g1"}]
+        catalog.invalidate("games")
+        db.games.gate.set()
+        # The caller that started before the delete still gets its snapshot,
+        # but it must not be published for later requests
+        assert [item["id"] for item in (await stale_read).items] == ["g1", "g2"]
+        assert [item["id"] for item in await catalog.list("games")] == ["g1"]
+        assert db.games.reads == 2
+    asyncio.run(main())
+
+
+def test_ttl_refresh_with_same_documents_keeps_the_etag():
+    async def main():
+        db = FakeDatabase(games=[{"id": "g1"}])
+        catalog = CatalogCache(db, ttl=0)
+        first = await catalog.load("games")
+        second = await catalog.load("games")
+        assert second is not first and second.etag == first.etag
+        db.games.items = [{"id": "g1", "name": "renamed"}]
+        assert (await catalog.load("games")).etag != first.etag
+    asyncio.run(main())
+
+
+def test_etags_follow_content_across_workers_and_restarts():
+    async def main():
+        db = FakeDatabase(games=[{"id": "g1"}, {"id": "g2"}], news=[{"id": "n1"}])
+        worker, other = CatalogCache(db), CatalogCache(db)
+        other.version = 41  # versions differ between workers and runs
+        games = await worker.load("games")
+        assert games.etag == (await other.load("games")).etag
+        assert (await worker.storefront())[1] == (await other.storefront())[1]
+        assert games.bodies_by_id["g1"].etag != games.bodies_by_id["g2"].etag
+
+        worker.invalidate("games")
+        assert (await worker.load("games")).etag == games.etag  # same documents, same tag
+        db.news.items = []
+        worker.invalidate("news")
+        assert (await worker.storefront())[1] != (await other.storefront())[1]
+    asyncio.run(main())
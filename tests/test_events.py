@@ -0,0 +1,49 @@
+import asyncio
+
+import mongomock_motor
+
+from catalog import CatalogCache
+from events import CatalogEvents
+from repositories import Database
+
+
+async def never_disconnected():
+    return False
+
+
+async def collect(stream, events, close_after: int):
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk)
+        if len(chunks) == close_after:
+            events.close_streams()
+    return chunks
+
+
+def test_close_streams_ends_streams_without_reset():
+    async def main():
+        db = Database(mongomock_motor.AsyncMongoMockClient())
+        events = CatalogEvents(db, CatalogCache(db), poll_interval=60)
+        await events.start()
+        # retry, then ready; the stream would otherwise wait for events forever
+        chunks = await asyncio.wait_for(collect(events.stream(never_disconnected), events, 2), 5)
+        assert chunks[-1].startswith(b"event: ready")
+        assert not any(b"reset" in chunk for chunk in chunks)
+        assert events.metrics()["subscribers"] == 0
+        # A stream opened while shutting down ends right away
+        assert [chunk async for chunk in events.stream(never_disconnected)] == []
+        await events.stop()
+    asyncio.run(main())
+
+
+def test_failed_publish_does_not_fail_the_write(client, admin_headers, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("event store down")
+    monkeypatch.setattr(client.app.state.events, "publish_many", broken)
+
+    news = {"title": "t", "title_ar": "ت", "content": "c", "content_ar": "م"}
+    created = client.post("/api/admin/news", json=news, headers=admin_headers)
+    assert created.status_code == 200, created.text
+    news_id = created.json()["id"]
+    assert any(item["id"] == news_id for item in client.get("/api/news").json()["news"])
+    assert client.delete(f"/api/admin/news/{news_id}", headers=admin_headers).status_code == 200
@@ -0,0 +1,54 @@
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def get(client, url, **headers):
+    return client.get(url, headers={**IDENTITY, **headers})
+
+
+def test_if_none_match_revalidates_catalog_routes(client):
+    game_id = client.get("/api/games").json()["games"][0]["id"]
+    for url in ("/api/games", "/api/news", "/api/banners", "/api/storefront", f"/api/games/{game_id}"):
+        first = get(client, url)
+        etag = first.headers["ETag"]
+        assert first.status_code == 200 and first.headers["Cache-Control"]
+
+        cached = get(client, url, **{"If-None-Match": etag})
+        assert cached.status_code == 304, url
+        assert cached.content == b"" and cached.headers["ETag"] == etag
+        # Weak comparison, lists and the wildcard all count as a match
+        assert get(client, url, **{"If-None-Match": f"W/{etag}"}).status_code == 304
+        assert get(client, url, **{"If-None-Match": f'"other", {etag}'}).status_code == 304
+        assert get(client, url, **{"If-None-Match": "*"}).status_code == 304
+        assert get(client, url, **{"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_catalog_change_invalidates_etags(client, admin_headers):
+    games, storefront = get(client, "/api/games"), get(client, "/api/storefront")
+    news = {"title": "t", "title_ar": "ت", "content": "c", "content_ar": "م"}
+    assert client.post("/api/admin/news", json=news, headers=admin_headers).status_code == 200
+
+    # News changed; games did not
+    assert get(client, "/api/games", **{"If-None-Match": games.headers["ETag"]}).status_code == 304
+    changed = get(client, "/api/storefront", **{"If-None-Match": storefront.headers["ETag"]})
+    assert changed.status_code == 200 and changed.headers["ETag"] != storefront.headers["ETag"]
+
+
+def test_each_content_coding_has_its_own_etag(client):
+    plain = get(client, "/api/storefront")
+    gzipped = client.get("/api/storefront", headers={"Accept-Encoding": "gzip"})
+    brotlied = client.get("/api/storefront", headers={"Accept-Encoding": "br"})
+    assert gzipped.headers["Content-Encoding"] == "gzip" and brotlied.headers["Content-Encoding"] == "br"
+    assert gzipped.headers["Vary"] == "Accept-Encoding"
+    etags = {plain.headers["ETag"], gzipped.headers["ETag"], brotlied.headers["ETag"]}
+    assert len(etags) == 3
+
+    # Same document in every coding (httpx decodes gzip/br transparently)
+    assert gzipped.json() == brotlied.json() == plain.json()
+
+    # A tag only matches the representation it was issued for
+    gzip_etag = gzipped.headers["ETag"]
+    assert client.get("/api/storefront", headers={"Accept-Encoding": "gzip",
+                                                   "If-None-Match": gzip_etag}).status_code == 304
+    assert client.get("/api/storefront", headers={"Accept-Encoding": "br",
+                                                   "If-None-Match": gzip_etag}).status_code == 200
+    assert get(client, "/api/storefront", **{"If-None-Match": gzip_etag}).status_code == 200
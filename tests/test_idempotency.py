@@ -0,0 +1,58 @@
+import asyncio
+
+import mongomock_motor
+import pytest
+
+import idempotency
+from idempotency import IdempotencyInProgress, IdempotencyStore
+
+
+class FlakyCollection:
+    # Fails the next `failures` response writes (update_one without upsert)
+    def __init__(self, collection, failures):
+        self.collection = collection
+        self.failures = failures
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def update_one(self, query, update, upsert=False):
+        if not upsert and self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo went away")
+        return await self.collection.update_one(query, update, upsert=upsert)
+
+
+def test_failed_response_write_is_retried_and_replayed(monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_STORE_RETRY_DELAY", 0.01)
+
+    async def main():
+        collection = FlakyCollection(mongomock_motor.AsyncMongoMockClient().db.keys, failures=2)
+        store = IdempotencyStore(collection)
+        assert await store.begin("k", "h") is None
+        await store.complete("k", "h", {"order_id": "o1"})  # must not raise
+
+        # This worker replays from its cache straight away...
+        assert await store.begin("k", "h") == {"order_id": "o1"}
+        # ...and another one once the retry has stored the response
+        other = IdempotencyStore(collection)
+        await store.stop()
+        assert await other.begin("k", "h") == {"order_id": "o1"}
+        assert store.metrics()["store_failures"] == 2 and store.metrics()["pending_stores"] == 0
+    asyncio.run(main())
+
+
+def test_key_stays_claimed_while_the_write_is_retried(monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_STORE_RETRY_DELAY", 0.01)
+
+    async def main():
+        collection = FlakyCollection(mongomock_motor.AsyncMongoMockClient().db.keys, failures=100)
+        store, other = IdempotencyStore(collection), IdempotencyStore(collection)
+        assert await store.begin("k", "h") is None
+        await store.complete("k", "h", {"order_id": "o1"})
+        await store.stop()
+        # The write never made it, but the claim was not released
+        with pytest.raises(IdempotencyInProgress):
+            await other.begin("k", "h")
+        assert store.metrics()["store_failures"] == 1 + idempotency.IDEMPOTENCY_STORE_RETRIES
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+import asyncio
+
+from images import ImageCache, ImageUnavailable
+
+
+class FailingFetcher:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    async def fetch(self, url):
+        self.calls += 1
+        raise self.error
+
+
+async def prewarmed(images, url):
+    images.prewarm(url)
+    await asyncio.gather(*images._prewarming)
+    return images.metrics()
+
+
+def test_prewarm_failures_are_logged_and_counted(tmp_path, capsys):
+    async def main():
+        unavailable = ImageCache(FailingFetcher(ImageUnavailable("gone")), str(tmp_path / "a"))
+        unavailable.start()
+        broken = ImageCache(FailingFetcher(RuntimeError("boom")), str(tmp_path / "b"))
+        broken.start()
+
+        assert (await prewarmed(unavailable, "http://x/a.jpg"))["errors"] == 1
+        metrics = await prewarmed(broken, "http://x/b.jpg")
+        # Stops at the first failure rather than retrying every variant
+        assert metrics["errors"] == 1 and metrics["prewarming"] == 0 and broken.fetcher.calls == 1
+    asyncio.run(main())
+    assert "boom" in capsys.readouterr().out
@@ -0,0 +1,45 @@
+import lru
+from lru import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(lru.time, "monotonic", clock)
+    cache = TTLCache(10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    cache.set("c", 3, ttl=3600)  # capped at the cache's own ttl
+
+    clock.now += 5
+    assert cache.get("b") is None and len(cache) == 2  # expired entries are dropped on read
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    clock.now += 55
+    assert cache.get("a", "gone") == "gone" and cache.get("c") is None
+    assert cache.metrics() == {"size": 0, "maxsize": 10, "hits": 2, "misses": 3}
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("a", 10)  # overwriting refreshes too
+    cache.set("d", 4)
+    assert cache.get("c") is None and cache.get("a") == 10
+
+    cache.pop("a")
+    cache.pop("missing")
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
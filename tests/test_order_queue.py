@@ -0,0 +1,162 @@
+import asyncio
+import fcntl
+import json
+import os
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import order_queue
+from order_queue import OrderQueue
+
+
+class FakeCollection:
+    # insert_many with a unique id, reporting duplicates the way Mongo does
+    def __init__(self, *existing):
+        self.docs = {doc["id"]: doc for doc in existing}
+
+    async def insert_many(self, documents, ordered=True):
+        errors = []
+        for index, document in enumerate(documents):
+            if document["id"] in self.docs:
+                errors.append({"index": index, "code": order_queue.DUPLICATE_KEY, "errmsg": "duplicate key"})
+            else:
+                self.docs[document["id"]] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [],
+                                  "nInserted": len(documents) - len(errors)})
+
+
+def order(order_id):
+    return {"id": order_id, "created_at": "2025-01-01T00:00:00"}
+
+
+def write_journal(path, *lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as journal_file:
+        journal_file.write("".join(lines))
+
+
+def journals(slot_dir):
+    return sorted(name for name in os.listdir(slot_dir) if name.endswith(".journal"))
+
+
+def test_enqueued_orders_reach_the_collection(tmp_path):
+    async def main():
+        collection = FakeCollection()
+        queue = OrderQueue(collection, str(tmp_path), flush_interval=60)
+        await queue.start()
+        await asyncio.gather(*(queue.enqueue(order(f"o{i}")) for i in range(5)))
+        assert queue.metrics()["depth"] == 5 and not collection.docs
+        await queue.flush()
+        assert set(collection.docs) == {f"o{i}" for i in range(5)}
+        assert queue.metrics()["depth"] == 0
+        await queue.stop()
+    asyncio.run(main())
+
+
+def test_batch_size_wakes_the_flusher(tmp_path):
+    async def main():
+        collection = FakeCollection()
+        queue = OrderQueue(collection, str(tmp_path), batch_size=3, flush_interval=60)
+        await queue.start()
+        await asyncio.gather(*(queue.enqueue(order(f"o{i}")) for i in range(2)))
+        await asyncio.sleep(0.05)
+        assert not collection.docs
+        await queue.enqueue(order("o2"))
+        for _ in range(100):
+            if len(collection.docs) == 3:
+                break
+            await asyncio.sleep(0.01)
+        assert len(collection.docs) == 3
+        await queue.stop()
+    asyncio.run(main())
+
+
+def test_replay_drops_a_torn_last_line(tmp_path):
+    slot_dir = tmp_path / "slot-0"
+    write_journal(str(slot_dir / "0.journal"), json.dumps(order("a")) + "\n", json.dumps(order("b")) + "\n")
+    write_journal(str(slot_dir / "1.journal"), json.dumps(order("c")) + "\n", '{"id": "torn", "crea')
+
+    async def main():
+        collection = FakeCollection()
+        queue = OrderQueue(collection, str(tmp_path), flush_interval=60)
+        await queue.start()
+        assert queue.metrics()["depth"] == 3
+        await queue.flush()
+        assert set(collection.docs) == {"a", "b", "c"}
+        # Replayed segments are removed once inserted; new orders go to a later one
+        await queue.enqueue(order("d"))
+        assert journals(slot_dir) == ["2.journal"]
+        await queue.stop()
+    asyncio.run(main())
+
+
+def test_replaying_inserted_orders_is_harmless(tmp_path):
+    write_journal(str(tmp_path / "slot-0" / "0.journal"), json.dumps(order("a")) + "\n", json.dumps(order("b")) + "\n")
+    inserted = []
+
+    async def record(orders):
+        inserted.extend(o["id"] for o in orders)
+
+    async def main():
+        # "a" made it into Mongo before the crash, its segment was not removed
+        collection = FakeCollection(order("a"))
+        queue = OrderQueue(collection, str(tmp_path), flush_interval=60, on_inserted=record)
+        await queue.start()
+        await queue.flush()
+        assert set(collection.docs) == {"a", "b"}
+        assert inserted == ["b"]
+        assert queue.metrics()["flush_errors"] == 0
+        await queue.stop()
+    asyncio.run(main())
+
+
+def test_unclaimed_slots_are_adopted(tmp_path):
+    # A previous run had four workers; slot-1 still belongs to a live one
+    for slot, ids in ((1, ["live"]), (2, ["a", "b"]), (3, ["c"])):
+        write_journal(str(tmp_path / f"slot-{slot}" / "0.journal"), *(json.dumps(order(i)) + "\n" for i in ids))
+    held = open(tmp_path / "slot-1" / "lock", "w")
+    fcntl.flock(held, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    async def main():
+        collection = FakeCollection()
+        queue = OrderQueue(collection, str(tmp_path), flush_interval=60)
+        await queue.start()
+        assert queue._slot_dir == str(tmp_path / "slot-0")
+        await queue.flush()
+        assert set(collection.docs) == {"a", "b", "c"}
+        assert journals(tmp_path / "slot-2") == journals(tmp_path / "slot-3") == []
+        assert journals(tmp_path / "slot-1") == ["0.journal"]
+        await queue.stop()
+    try:
+        asyncio.run(main())
+    finally:
+        held.close()
+
+
+def test_failed_fsync_is_retried_for_the_same_files(tmp_path, monkeypatch):
+    synced = []
+    real_fsync_all = order_queue._fsync_all
+
+    def flaky_fsync_all(files):
+        synced.append([f.name for f in files])
+        if len(synced) == 1:
+            raise OSError("disk error")
+        real_fsync_all(files)
+    monkeypatch.setattr(order_queue, "_fsync_all", flaky_fsync_all)
+
+    async def main():
+        collection = FakeCollection()
+        queue = OrderQueue(collection, str(tmp_path), flush_interval=60)
+        await queue.start()
+        first_segment = queue._active.path
+        # Not acknowledged: the journal write may not be on disk
+        with pytest.raises(OSError):
+            await queue.enqueue(order("a"))
+        # Sealing the segment must sync its file again before inserting from it
+        await queue.flush()
+        assert synced[1] == [first_segment]
+        assert set(collection.docs) == {"a"}
+        await queue.stop()
+    asyncio.run(main())
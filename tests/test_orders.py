@@ -0,0 +1,148 @@
+import csv
+import io
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from server import decode_cursor, encode_cursor
+
+
+def insert_orders(client, orders):
+    async def insert():
+        await client.app.state.db.orders.insert_many([dict(order) for order in orders])
+    client.portal.call(insert)
+
+
+def make_order(order_id, created_at, **fields):
+    return {"id": order_id, "created_at": created_at, "status": "pending", "game_id": "g1", **fields}
+
+
+def list_orders(client, headers, **params):
+    response = client.get("/api/admin/orders", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"created_at": "2025-01-01T10:00:00", "id": "o1", "status": "pending"})
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2025-01-01T10:00:00", "o1")
+    for garbage in ("garbage!!", "MTIz", encode_cursor({"created_at": 1, "id": "x"})):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(garbage)
+        assert error.value.status_code == 400
+
+
+def test_pages_cover_every_order_once(client, admin_headers):
+    # Several orders share a created_at, so the id has to break the tie
+    orders = [make_order(f"o{i:02d}", f"2025-01-0{1 + i % 3}T10:00:00") for i in range(11)]
+    insert_orders(client, orders)
+
+    seen, cursor = [], None
+    while True:
+        page = list_orders(client, admin_headers, limit=4, **({"cursor": cursor} if cursor else {}))
+        assert len(page["orders"]) <= 4
+        seen += page["orders"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    keys = [(order["created_at"], order["id"]) for order in seen]
+    assert keys == sorted(((o["created_at"], o["id"]) for o in orders), reverse=True)
+    assert client.get("/api/admin/orders", params={"cursor": "garbage!!"}, headers=admin_headers).status_code == 400
+
+
+def test_filters(client, admin_headers):
+    insert_orders(client, [
+        make_order("a", "2025-01-01T09:00:00"),
+        make_order("b", "2025-01-02T09:00:00", status="done"),
+        make_order("c", "2025-01-03T09:00:00", game_id="g2"),
+    ])
+
+    def ids(**params):
+        return [order["id"] for order in list_orders(client, admin_headers, **params)["orders"]]
+    assert ids(status="done") == ["b"]
+    assert ids(game_id="g2") == ["c"]
+    assert ids(created_from="2025-01-02T00:00:00") == ["c", "b"]
+    assert ids(created_to="2025-01-02T09:00:00") == ["a"]
+    assert ids(created_from="2025-01-02", created_to="2025-01-03", status="done") == ["b"]
+    # Filters carry over to later pages
+    first = list_orders(client, admin_headers, limit=1, created_from="2025-01-02T00:00:00")
+    assert [o["id"] for o in list_orders(client, admin_headers, limit=1, cursor=first["next_cursor"],
+                                         created_from="2025-01-02T00:00:00")["orders"]] == ["b"]
+
+
+def test_filters_convert_offsets_to_server_time(client, admin_headers, monkeypatch):
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    try:
+        insert_orders(client, [
+            make_order("a", "2025-01-01T09:00:00"),
+            make_order("b", "2025-01-02T09:00:00"),
+            make_order("c", "2025-01-03T09:00:00"),
+        ])
+
+        def ids(**params):
+            return [order["id"] for order in list_orders(client, admin_headers, **params)["orders"]]
+        # 12:00 in Riyadh is 09:00 on the server
+        assert ids(created_from="2025-01-02T12:00:00+03:00") == ["c", "b"]
+        assert ids(created_to="2025-01-02T09:00:00Z") == ["a"]
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def checkout(game, package, **overrides):
+    return {"game_id": game["id"], "game_name": game["name_ar"], "player_id": "p1",
+            "amount": package["amount"], "price": package["price"], "currency": package["currency"],
+            "customer_name": "n", "customer_phone": "1", **overrides}
+
+
+def test_order_prices_are_checked_against_the_catalog(client, admin_headers):
+    game = client.get("/api/games").json()["games"][0]
+    package = game["prices"][0]
+    assert client.post("/api/orders", json=checkout(game, package)).status_code == 200
+
+    for tampered in ({"price": 0.01}, {"currency": "USD"}, {"amount": "999 gems"}, {"game_id": "missing"}):
+        response = client.post("/api/orders", json=checkout(game, package, **tampered))
+        assert response.status_code == 400, tampered
+
+    # An admin price change takes effect for the next checkout
+    stored = next(g for g in client.get("/api/admin/games", headers=admin_headers).json()["games"]
+                  if g["id"] == game["id"])
+    stored["prices"][0]["price"] = 9.5
+    editable = {key: stored[key] for key in ("name", "name_ar", "description", "description_ar",
+                                             "image_url", "prices", "is_active")}
+    assert client.put(f"/api/admin/games/{game['id']}", json=editable, headers=admin_headers).status_code == 200
+    assert client.post("/api/orders", json=checkout(game, package)).status_code == 400
+    assert client.post("/api/orders", json=checkout(game, package, price=9.5)).status_code == 200
+
+    # Inactive games cannot be ordered
+    editable["is_active"] = False
+    assert client.put(f"/api/admin/games/{game['id']}", json=editable, headers=admin_headers).status_code == 200
+    assert client.post("/api/orders", json=checkout(game, package, price=9.5)).status_code == 400
+
+
+def test_legacy_string_prices_still_validate(client):
+    async def legacy_game():
+        await client.app.state.db.games.insert({
+            "id": "legacy", "name": "Legacy", "name_ar": "قديم", "is_active": True,
+            "prices": [{"amount": "70 عملة", "price": "5", "currency": "ريال"}],
+        })
+        client.app.state.catalog.invalidate("games")
+    client.portal.call(legacy_game)
+    game = {"id": "legacy", "name_ar": "قديم"}
+    package = {"amount": "70 عملة", "price": 5, "currency": "ريال"}
+    assert client.post("/api/orders", json=checkout(game, package)).status_code == 200
+    assert client.post("/api/orders", json=checkout(game, package, price=5.5)).status_code == 400
+
+
+def test_csv_export_neutralizes_formulas(client, admin_headers):
+    hostile = ["=HYPERLINK(\"http://x\")", "+1+1", "-2", "@SUM(A1)", "\tcmd", "\rcmd"]
+    insert_orders(client, [make_order(f"o{i}", f"2024-01-01T00:00:0{i}", customer_name=name)
+                           for i, name in enumerate(hostile + ["سارة"])])
+
+    response = client.get("/api/admin/orders/export?format=csv", headers=admin_headers)
+    rows = list(csv.DictReader(io.StringIO(response.text.lstrip("﻿"))))
+    names = {row["customer_name"] for row in rows}
+    assert names == {"'" + name for name in hostile} | {"سارة"}
@@ -0,0 +1,35 @@
+import asyncio
+
+import mongomock_motor
+
+from migrate_prices import migrate
+from pricing import PricePackage, format_price, parse_price, parse_quantity
+from repositories import Database
+
+
+def test_parsing():
+    assert parse_price("5") == 5.0 and parse_price(4.5) == 4.5
+    assert parse_quantity("70 عملة") == 70
+    assert parse_quantity("٧٠ عملة") == 70  # Arabic-Indic digits
+    assert parse_quantity("بطاقة") is None
+    assert format_price(5.0) == "5" and format_price(4.5) == "4.5"
+    assert PricePackage(amount="325 UC", price=5, currency="$").quantity == 325
+
+
+def test_migrate_types_prices_and_reports_unparseable_ones():
+    async def main():
+        db = Database(mongomock_motor.AsyncMongoMockClient())
+        await db.games.insert({"id": "ok", "prices": [{"amount": "70 عملة", "price": "5", "currency": "ر"}]})
+        await db.games.insert({"id": "bad", "name": "B", "prices": [{"amount": "1", "price": "5 ريال", "currency": "ر"}]})
+
+        scanned, changed, problems = await migrate(db, dry_run=True)
+        assert (scanned, changed) == (2, 1) and len(problems) == 1 and "bad" in problems[0]
+        assert (await db.games.get_by_id("ok"))["prices"][0]["price"] == "5"
+
+        assert (await migrate(db))[:2] == (2, 1)
+        assert (await migrate(db))[:2] == (2, 0)
+        assert (await db.games.get_by_id("ok"))["prices"] == [
+            {"amount": "70 عملة", "quantity": 70, "price": 5.0, "currency": "ر"}]
+        # Left as-is for a human to fix, never stored as 0
+        assert (await db.games.get_by_id("bad"))["prices"][0]["price"] == "5 ريال"
+    asyncio.run(main())
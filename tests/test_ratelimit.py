@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import serve
+
+
+def login(client, username, forwarded_for):
+    return client.post("/api/users/login", json={"username": username, "password": "wrong"},
+                       headers={"X-Forwarded-For": forwarded_for})
+
+
+@pytest.fixture
+def proxied_client(mongo_client, monkeypatch):
+    # The app as serve.py runs it, proxy header handling included. TestClient
+    # connects from the peer address "testclient".
+    monkeypatch.setenv("RATE_LIMIT_LOGIN_IP", "2/60")
+
+    def start(forwarded_allow_ips):
+        monkeypatch.setattr(serve, "FORWARDED_ALLOW_IPS", forwarded_allow_ips)
+        config = serve.build_config()
+        config.load()
+        return TestClient(config.loaded_app)
+    return start
+
+
+def test_trusted_proxy_limits_each_forwarded_client(proxied_client):
+    with proxied_client("testclient") as client:
+        assert login(client, "probe-1", "203.0.113.1").status_code == 401
+        assert login(client, "probe-2", "203.0.113.1").status_code == 401
+        limited = login(client, "probe-3", "203.0.113.1")
+        assert limited.status_code == 429
+        assert int(limited.headers["Retry-After"]) >= 1
+        # Another customer behind the same proxy has a bucket of their own
+        assert login(client, "probe-4", "203.0.113.2").status_code == 401
+
+
+def test_untrusted_peer_cannot_pick_its_bucket(proxied_client):
+    with proxied_client("127.0.0.1") as client:
+        assert login(client, "probe-1", "203.0.113.1").status_code == 401
+        assert login(client, "probe-2", "203.0.113.2").status_code == 401
+        assert login(client, "probe-3", "203.0.113.3").status_code == 429
@@ -0,0 +1,88 @@
+from search import SearchIndex, normalize
+
+
+def game(game_id, name, name_ar, description="", description_ar=""):
+    return {"id": game_id, "name": name, "name_ar": name_ar,
+            "description": description, "description_ar": description_ar}
+
+
+def make_index(*games):
+    index = SearchIndex()
+    index.sync(games)
+    return index
+
+
+def test_normalize_folds_arabic_variants():
+    assert normalize("أحمد") == normalize("إحمد") == normalize("آحمد") == normalize("احمد")
+    assert normalize("ٱلعاب") == normalize("العاب")
+    assert normalize("لعبة") == normalize("لعبه")
+    assert normalize("مستوى") == normalize("مستوي")
+    assert normalize("لُعْبَة") == normalize("لعبه")  # tashkeel
+    assert normalize("شـحـن") == normalize("شحن")  # tatweel
+    assert normalize("PUBG Café") == "pubg cafe"
+
+
+def test_arabic_variants_match_each_other():
+    index = make_index(
+        game("1", "Adventure", "لعبة مغامرات", description_ar="إضافة جديدة"),
+        game("2", "Racing", "سباق", description_ar="مستوى متقدم"),
+    )
+    assert index.search("لعبه") == ["1"]
+    assert index.search("اضافه") == ["1"]
+    assert index.search("أضافة") == ["1"]
+    assert index.search("مستوي") == ["2"]
+
+
+def test_mixed_script_query_needs_every_word():
+    index = make_index(
+        game("1", "PUBG Mobile", "ببجي موبايل"),
+        game("2", "Free Fire", "فري فاير"),
+        game("3", "Mobile Legends", "موبايل ليجندز"),
+    )
+    assert index.search("pubg موبايل") == ["1"]
+    assert index.search("legends موبايل") == ["3"]
+    assert index.search("fire موبايل") == []
+
+
+def test_ranking():
+    index = make_index(
+        game("desc", "Arena", "ساحة", description="the best mobile shooter"),
+        game("contains", "PUBG Mobile", "ببجي"),
+        game("prefix", "Mobile Legends", "ليجندز"),
+        game("typo", "Mobil Racer", "سباق"),
+    )
+    # name prefix, then name containing the query, then a near miss in a
+    # name, then a description hit
+    assert index.search("mobile") == ["prefix", "contains", "typo", "desc"]
+    assert index.search("mobile", limit=2) == ["prefix", "contains"]
+
+
+def test_ties_are_ordered_by_name():
+    index = make_index(*(game(str(i), f"Card {name}", "بطاقة") for i, name in enumerate("dcab")))
+    assert index.search("card") == ["2", "3", "1", "0"]
+
+
+def test_single_letter_matches_word_prefixes():
+    index = make_index(
+        game("1", "PUBG Mobile", "ببجي موبايل"),
+        game("2", "Free Fire", "فري فاير"),
+        game("3", "X", "اكس"),
+    )
+    assert set(index.search("p")) == {"1"}
+    assert set(index.search("ف")) == {"2"}
+    assert index.search("x") == ["3"]
+    assert index.search("pubg m") == ["1"]
+
+
+def test_results_follow_index_changes():
+    games = [game("1", "PUBG Mobile", "ببجي"), game("2", "Free Fire", "فري فاير")]
+    index = make_index(*games)
+    assert index.search("fire") == ["2"]
+    assert index.search("fire") == ["2"]
+    assert index.metrics()["cache"]["hits"] == 1
+
+    assert index.sync([games[0], dict(games[1], name="Free Fire MAX"), game("3", "Fire Emblem", "")]) == 2
+    assert index.search("fire") == ["3", "2"]
+    assert index.search("max") == ["2"]
+    assert index.sync([games[0]]) == 2
+    assert index.search("fire") == []
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+
+import server
+from tests.conftest import wait_until_ready
+
+
+def test_readiness_reports_starting_until_startup_steps_succeed(mongo_client, monkeypatch):
+    attempts = []
+    real_seed = server.seed
+
+    async def flaky_seed(db):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("mongo unreachable")
+        return await real_seed(db)
+    monkeypatch.setattr(server, "seed", flaky_seed)
+    monkeypatch.setattr(server, "STARTUP_RETRY_DELAY", 0.2)
+
+    with TestClient(server.app) as client:
+        # Serving already, but not ready
+        assert client.get("/api/health/live").status_code == 200
+        starting = client.get("/api/health/ready")
+        assert starting.status_code == 503
+        assert starting.json()["status"] == "starting"
+
+        wait_until_ready(client)
+        ready = client.get("/api/health/ready").json()
+        assert ready["status"] == "ready"
+        assert set(ready["startup"]["phases"]) == {"indexes", "seed", "events"}
+        assert len(attempts) == 3